@@ -0,0 +1,70 @@
+"""
+Benchmark de los motores de predicción: un RandomForest por producto frente a un modelo global.
+
+Entrena ambos motores con el historial sintético sin los últimos días de cada
+producto y compara el tiempo de entrenamiento, el MAE/RMSE histórico que
+`daily_prediction` guarda en `model_errors` y el MAE/RMSE sobre los días retenidos.
+
+Uso:
+  python -m benchmarks.bench_engines [--products N] [--days D] [--holdout H]
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.synthetic import build_features, generate_price_history
+from model.engines import GlobalEngine, PerProductEngine, errors_by_product
+
+
+def split_holdout(features, holdout):
+    """
+    Separa los últimos `holdout` días de cada producto y construye sus filas
+    como lo hace `daily_prediction`: calificación media y promedios móviles
+    con los últimos precios conocidos.
+    """
+    position = features.groupby("product_id").cumcount(ascending=False)
+    train = features[position >= holdout].reset_index(drop=True)
+    future = features[position < holdout].reset_index(drop=True)
+
+    grouped = train.groupby("product_id")
+    known = grouped["rating"].mean().to_frame("rating")
+    known["moving_avg_3"] = grouped["price"].apply(lambda prices: prices.iloc[-3:].mean())
+    known["moving_avg_7"] = grouped["price"].apply(lambda prices: prices.iloc[-7:].mean())
+
+    future = future.drop(columns=["rating", "moving_avg_3", "moving_avg_7"]).join(known, on="product_id")
+    return train, future
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de motores de predicción")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--holdout", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    features, _ = build_features(generate_price_history(args.products, args.days))
+    train, future = split_holdout(features, args.holdout)
+
+    engines = [PerProductEngine(workers=args.workers), GlobalEngine()]
+
+    print(f"{args.products} productos x {args.days} días, {args.holdout} días retenidos")
+    print(f"{'motor':<13}{'tiempo (s)':>11}{'MAE hist.':>11}{'RMSE hist.':>12}{'MAE ret.':>10}{'RMSE ret.':>11}")
+
+    for engine in engines:
+        started_at = time.perf_counter()
+        predictions, errors = engine.predict(train, future)
+        elapsed = time.perf_counter() - started_at
+
+        holdout_errors = errors_by_product(future["product_id"].to_numpy(), future["price"].to_numpy(), predictions)
+
+        print(
+            f"{engine.name:<13}{elapsed:>11.2f}{errors['mae'].mean():>11.3f}{errors['rmse'].mean():>12.3f}"
+            f"{holdout_errors['mae'].mean():>10.3f}{holdout_errors['rmse'].mean():>11.3f}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Benchmark de los extractores de páginas de producto.
+
+Mide el tiempo de extracción y la memoria pico por página para cada backend
+(tracemalloc solo ve las asignaciones de Python, no las internas de lxml)
+y verifica que todos produzcan exactamente el mismo resultado que BeautifulSoup.
+
+Uso:
+  python -m benchmarks.bench_extractors [directorio_de_fixtures] [--repeat N]
+  python -m benchmarks.bench_extractors --cache http_cache [--limit N]
+
+Con --cache se usan las páginas reales guardadas por la caché de respuestas del scraper.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+from utils.extractors import EXTRACTORS, SoupExtractor
+from utils.http_cache import ResponseCache
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_pages(directory):
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def load_cached_pages(directory, limit):
+    pages = {}
+    for url, html in ResponseCache(directory).pages():
+        if len(pages) >= limit:
+            break
+        pages[url.rstrip("/").rsplit("/", 1)[-1][:27]] = html
+    return pages
+
+
+def measure(extractor, html, repeat):
+    """
+    Devuelve (resultado, mejor tiempo en ms, memoria pico en KiB).
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = extractor.extract(html)
+        best = min(best, time.perf_counter() - started_at)
+
+    tracemalloc.start()
+    extractor.extract(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, best * 1000, peak / 1024
+
+
+def run(pages, repeat):
+    extractors = []
+    for name, extractor_class in EXTRACTORS.items():
+        try:
+            extractors.append(extractor_class())
+        except ImportError as e:
+            print(f"Se omite '{name}': {e}")
+
+    reference = SoupExtractor()
+    mismatches = 0
+
+    print(f"{'página':<28}{'backend':<10}{'tiempo (ms)':>12}{'pico (KiB)':>12}")
+    for page_name, html in pages.items():
+        expected = reference.extract(html)
+        for extractor in extractors:
+            result, elapsed_ms, peak_kib = measure(extractor, html, repeat)
+            print(f"{page_name:<28}{extractor.name:<10}{elapsed_ms:>12.2f}{peak_kib:>12.1f}")
+            if result != expected:
+                mismatches += 1
+                print(f"  Diferencia en {page_name} ({extractor.name}): {result} != {expected}")
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extractores")
+    parser.add_argument("directory", nargs="?", default=FIXTURES_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--cache", help="Directorio de la caché de respuestas del scraper")
+    parser.add_argument("--limit", type=int, default=50, help="Páginas de la caché a medir")
+    args = parser.parse_args()
+
+    if args.cache:
+        pages = load_cached_pages(args.cache, args.limit)
+    else:
+        pages = load_pages(args.directory)
+    if not pages:
+        print(f"No hay páginas en {args.cache or args.directory}")
+        return 1
+
+    mismatches = run(pages, args.repeat)
+    if mismatches:
+        print(f"{mismatches} resultados distintos al extractor 'soup'.")
+        return 1
+
+    print("Todos los extractores producen el mismo resultado.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+Benchmark del proceso diario completo con datos sintéticos.
+
+Crea una base de MySQL desechable con N productos x D días de historial en `scraping-data`
+y las predicciones de los últimos días (con huecos de precio real), carga los productos en
+MongoDB y sirve las páginas de producto desde un servidor HTTP local con la página de
+`fixtures`. Después ejecuta y mide cada etapa en el orden del pipeline:
+process_documents, daily_prediction, update_real_prices, fix_null_prices,
+calculate_updated_errors y etl_update.
+
+Las consultas usan SQL de MySQL (UPDATE ... JOIN, ON DUPLICATE KEY, funciones de ventana),
+así que se necesita un servidor MySQL 8 de pruebas, por ejemplo:
+  docker run -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=bench mysql:8
+Se usan MYSQL_HOST/PORT/USER/PASSWORD del entorno; la base (--database) se crea y se
+elimina al terminar y nunca puede ser la MYSQL_DATABASE configurada. MongoDB se reemplaza
+por mongomock salvo que se indique BENCH_MONGO_URI.
+
+Los resultados (tiempo y memoria pico por etapa, revisión y máquina) se guardan en JSON
+para compararlos entre revisiones ejecutadas en la misma máquina.
+
+Uso:
+  python -m benchmarks.bench_pipeline [--products N] [--days D] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.migrations import read_schema
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_PAGE = os.path.join(os.path.dirname(__file__), "fixtures", "product_basic.html")
+
+# Precio de la página de ejemplo que el servidor local reemplaza por el de cada producto
+FIXTURE_PRICE = ('US$19.99', '<span class="a-price-whole">19<span class="a-price-decimal">.</span></span><span class="a-price-fraction">99</span>')
+
+
+def configure_environment(args):
+    """
+    Apunta la configuración del proyecto a la base de pruebas. Debe ejecutarse antes de
+    importar los módulos del proyecto, que leen las variables de entorno al importarse.
+    """
+    load_dotenv()
+    if args.database == os.getenv("MYSQL_DATABASE"):
+        raise SystemExit(f"La base de pruebas no puede ser la MYSQL_DATABASE configurada ({args.database}).")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.environ.update({
+        "MYSQL_DATABASE": args.database,
+        "PBI_DATABASE": f"{args.database}_pbi",
+        "MONGO_URI": os.getenv("BENCH_MONGO_URI", "mongomock://localhost"),
+        "MONGO_DB_NAME": args.database,
+        "SCRAPING_MODE": "concurrent",
+        "SCRAPING_CONCURRENCY": str(args.concurrency),
+        "SCRAPING_RATE_PER_HOST": "1000000",
+        "SCRAPING_BURST_PER_HOST": str(args.concurrency),
+        "SCRAPING_DISTRIBUTED": "0",
+        "CRAWL_ADAPTIVE": "0",
+        "HTTP_CACHE_ENABLED": "0",
+        "MODEL_CACHE_DIR": os.path.join(work_dir, "model_cache"),
+        "PIPELINE_HISTORY_FILE": os.path.join(work_dir, "pipeline_runs.jsonl"),
+    })
+    return work_dir
+
+
+def create_databases(connect, database):
+    main_statements, pbi_statements = read_schema()
+    connection = connect()
+    try:
+        cursor = connection.cursor()
+        for name, schema in ((database, main_statements), (f"{database}_pbi", pbi_statements)):
+            cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+            cursor.execute(f"CREATE DATABASE `{name}`")
+            cursor.execute(f"USE `{name}`")
+            for statement in schema:
+                cursor.execute(statement)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def drop_databases(connect, database):
+    connection = connect()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+        cursor.execute(f"DROP DATABASE IF EXISTS `{database}_pbi`")
+    finally:
+        connection.close()
+
+
+def generate_dataset(n_products, n_days, prediction_days, gap_fraction, seed=0):
+    """
+    Devuelve (historial de `scraping-data`, predicciones pasadas, último precio por producto).
+    El historial termina ayer; las predicciones cubren sus últimos `prediction_days` días y
+    una fracción `gap_fraction` de esos días se quita del historial para dejar huecos de precio real.
+    """
+    from benchmarks.synthetic import build_features, generate_price_history
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = today - timedelta(days=n_days) + timedelta(hours=3)
+    history = generate_price_history(n_products, n_days, seed=seed, start=start.strftime("%Y-%m-%d %H:%M:%S"))
+
+    features, _ = build_features(history)
+    recent = features["timestamp"] >= today - timedelta(days=prediction_days)
+    predictions = features[recent].copy()
+    rng = np.random.default_rng(seed)
+    predictions["predicted_price"] = (predictions["price"] * rng.normal(1, 0.02, len(predictions))).round(2)
+
+    gaps = recent.to_numpy() & (rng.random(len(features)) < gap_fraction)
+    history = features.loc[~gaps, ["product_id", "timestamp", "price", "rating"]]
+    last_prices = {int(product_id): float(price) for product_id, price in features.groupby("product_id")["price"].last().items()}
+    return history, predictions, last_prices
+
+
+def insert_rows(connection, query, rows, batch_size=5000):
+    cursor = connection.cursor()
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(query, rows[start:start + batch_size])
+    connection.commit()
+
+
+def load_dataset(connection, history, predictions, base_url):
+    scraping_rows = [
+        (f"{index:024x}", int(r.product_id), "Producto sintético", float(r.rating), float(r.price),
+         f"{base_url}/dp/{int(r.product_id)}", r.timestamp.to_pydatetime())
+        for index, r in enumerate(history.itertuples(index=False))
+    ]
+    insert_rows(connection, """
+    INSERT INTO `scraping-data` (_id, product_id, title, rating, price, url, timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, scraping_rows)
+
+    prediction_rows = [
+        (int(r.product_id), r.timestamp.to_pydatetime(), float(r.predicted_price), int(r.day), int(r.month),
+         int(r.day_of_week), int(r.days_since_start), float(r.rating), float(r.moving_avg_3), float(r.moving_avg_7))
+        for r in predictions.itertuples(index=False)
+    ]
+    insert_rows(connection, """
+    INSERT INTO predictions (product_id, timestamp, predicted_price, day, month, day_of_week, days_since_start, rating, moving_avg_3, moving_avg_7)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, prediction_rows)
+    return len(scraping_rows), len(prediction_rows)
+
+
+def start_product_server(last_prices):
+    """
+    Servidor HTTP local que responde /dp/<id> con la página de ejemplo y el precio del producto.
+    """
+    with open(FIXTURE_PAGE, encoding="utf-8") as f:
+        template = f.read()
+    offscreen, visible = FIXTURE_PRICE
+
+    class ProductHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            match = re.fullmatch(r"/dp/(\d+)", self.path)
+            price = last_prices.get(int(match.group(1))) if match else None
+            if price is None:
+                self.send_error(404)
+                return
+            whole, fraction = f"{price:.2f}".split(".")
+            body = template.replace(offscreen, f"US${price:.2f}").replace(visible, (
+                f'<span class="a-price-whole">{whole}<span class="a-price-decimal">.</span></span>'
+                f'<span class="a-price-fraction">{fraction}</span>'
+            )).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProductHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def peak_rss_mib():
+    if resource is None:
+        return None
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_stages(stages):
+    """
+    Ejecuta las etapas en orden y devuelve {etapa: {"seconds", "peak_rss_mib", "stats", "error"}}.
+    """
+    results = {}
+    for name, func in stages:
+        print(f"--- {name} ---")
+        started_at = time.perf_counter()
+        try:
+            stats = func()
+            error = stats.get("error") if isinstance(stats, dict) else None
+        except Exception as e:
+            stats, error = None, str(e)
+        results[name] = {
+            "seconds": time.perf_counter() - started_at,
+            "peak_rss_mib": peak_rss_mib(),
+            "stats": stats,
+            "error": error,
+        }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results):
+    print(f"{'etapa':<26}{'tiempo (s)':>12}{'RSS pico (MiB)':>16}")
+    for name, stage in results["stages"].items():
+        rss = f"{stage['peak_rss_mib']:>16.0f}" if stage["peak_rss_mib"] is not None else f"{'-':>16}"
+        status = f"  ERROR: {stage['error']}" if stage["error"] else ""
+        print(f"{name:<26}{stage['seconds']:>12.2f}{rss}{status}")
+    print(f"{'total':<26}{results['total_seconds']:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del proceso diario con datos sintéticos")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--prediction-days", type=int, default=7, help="Días de predicciones pasadas por conciliar")
+    parser.add_argument("--gap-fraction", type=float, default=0.05, help="Fracción de esos días sin precio real")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--database", default="tita_bench", help="Base de MySQL desechable")
+    parser.add_argument("--output", default="bench_pipeline.json")
+    parser.add_argument("--keep", action="store_true", help="No eliminar las bases de pruebas al terminar")
+    args = parser.parse_args()
+
+    configure_environment(args)
+
+    # Los módulos del proyecto se importan con la configuración de pruebas ya aplicada
+    import pymysql
+    from data.checker import calculate_updated_errors, fix_null_prices, update_real_prices
+    from data.updater import etl_update
+    from model.predicter import daily_prediction
+    from utils.database import close_connections, config, get_input_collection, get_output_collection, mysql_connection
+    from utils.scheduler import process_documents
+
+    server_config = {key: value for key, value in config.items() if key != "database"}
+
+    def connect():
+        return pymysql.connect(**server_config)
+
+    print(f"Generando {args.products} productos x {args.days} días...")
+    started_at = time.perf_counter()
+    history, predictions, last_prices = generate_dataset(args.products, args.days, args.prediction_days, args.gap_fraction)
+
+    server = start_product_server(last_prices)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    create_databases(connect, args.database)
+    try:
+        with mysql_connection() as connection:
+            scraping_rows, prediction_rows = load_dataset(connection, history, predictions, base_url)
+
+        products = get_input_collection()
+        products.drop()
+        get_output_collection().drop()
+        products.insert_many([{"idProduct": product_id, "url": f"{base_url}/dp/{product_id}"} for product_id in last_prices])
+        setup_seconds = time.perf_counter() - started_at
+        print(f"{scraping_rows} filas de historial y {prediction_rows} predicciones cargadas en {setup_seconds:.1f} s.")
+
+        stages = run_stages([
+            ("process_documents", process_documents),
+            ("daily_prediction", daily_prediction),
+            ("update_real_prices", update_real_prices),
+            ("fix_null_prices", fix_null_prices),
+            ("calculate_updated_errors", calculate_updated_errors),
+            ("etl_update", etl_update),
+        ])
+    finally:
+        server.shutdown()
+        if not args.keep:
+            get_input_collection().drop()
+            get_output_collection().drop()
+            drop_databases(connect, args.database)
+        close_connections()
+
+    results = {
+        "meta": {
+            "products": args.products,
+            "days": args.days,
+            "prediction_days": args.prediction_days,
+            "gap_fraction": args.gap_fraction,
+            "concurrency": args.concurrency,
+            "scraping_rows": scraping_rows,
+            "prediction_rows": prediction_rows,
+            "setup_seconds": setup_seconds,
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "stages": stages,
+        "total_seconds": sum(stage["seconds"] for stage in stages.values()),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+
+    print()
+    print_report(results)
+    print(f"Resultados guardados en {args.output}.")
+
+    failed = [name for name, stage in stages.items() if stage["error"]]
+    if failed:
+        print(f"Etapas con error: {', '.join(failed)}.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Prueba de carga del reparto de productos entre trabajadores con reservas (LeaseQueue).
+
+Crea productos sintéticos en una colección temporal, simula un trabajador que reserva un
+lote y se cae sin terminarlo, y ejecuta varios trabajadores que descargan (con una espera
+simulada) hasta completar todos los productos. Verifica que ningún producto se procese
+dos veces y que los reservados por el trabajador caído se retomen al vencer su reserva.
+
+Con MONGO_URI=mongodb://... los trabajadores son procesos independientes contra el mongod
+configurado; con MONGO_URI=mongomock://localhost (servidor en memoria) son hilos y cada
+operación se serializa con un candado, como lo haría el servidor.
+
+Uso:
+  python -m benchmarks.bench_sharding [--products N] [--workers W] [--lease S]
+"""
+import argparse
+import sys
+import threading
+import time
+from multiprocessing import Process
+
+from utils.database import MONGO_URI, get_mongo_client, MONGO_DB_NAME
+from utils.leases import LeaseQueue
+
+INPUT_COLLECTION = "bench_leases_products"
+LOG_COLLECTION = "bench_leases_log"
+USE_MONGOMOCK = (MONGO_URI or "").startswith("mongomock://")
+MONGOMOCK_LOCK = threading.Lock()
+
+
+class SerializedCollection:
+    """
+    mongomock no es seguro entre hilos: cada llamada se ejecuta con un candado global
+    para que cada operación sea atómica como en un mongod real.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        attribute = getattr(self.collection, name)
+        if not callable(attribute):
+            return attribute
+
+        def locked(*args, **kwargs):
+            with MONGOMOCK_LOCK:
+                result = attribute(*args, **kwargs)
+                return list(result) if name == "find" else result
+        return locked
+
+
+def collections():
+    db = get_mongo_client()[MONGO_DB_NAME]
+    if USE_MONGOMOCK:
+        return SerializedCollection(db[INPUT_COLLECTION]), SerializedCollection(db[LOG_COLLECTION])
+    return db[INPUT_COLLECTION], db[LOG_COLLECTION]
+
+
+def worker(worker_id, batch_size, lease_seconds, fetch_seconds, deadline):
+    products, log = collections()
+    queue = LeaseQueue(products, worker_id=worker_id, batch_size=batch_size,
+                       lease_seconds=lease_seconds, adaptive=False)
+
+    # Se sigue reclamando mientras queden productos, aunque estén reservados por otro
+    while time.time() < deadline:
+        for doc in queue.documents():
+            time.sleep(fetch_seconds)
+            log.insert_one({"product": doc["idProduct"], "worker": worker_id})
+            queue.complete(doc, True)
+        queue.close()
+
+        if products.count_documents({"last_crawled_at": None}) == 0:
+            break
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de reparto de productos con reservas")
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=10)
+    parser.add_argument("--lease", type=float, default=2.0, help="Duración de la reserva en segundos")
+    parser.add_argument("--fetch-ms", type=float, default=5.0, help="Duración simulada de cada descarga")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    products, log = collections()
+    products.drop()
+    log.drop()
+    products.insert_many([{"idProduct": i, "url": f"https://example.com/dp/{i}"} for i in range(1, args.products + 1)])
+
+    # Trabajador que reserva un lote y se cae sin completarlo ni liberarlo
+    crashed = LeaseQueue(products, worker_id="caido", batch_size=args.batch, lease_seconds=args.lease, adaptive=False)
+    abandoned = {doc["idProduct"] for doc in crashed.claim_batch()}
+
+    use_processes = not USE_MONGOMOCK
+    runner = Process if use_processes else threading.Thread
+    deadline = time.time() + args.timeout
+
+    started_at = time.perf_counter()
+    workers = [
+        runner(target=worker, args=(f"w{i}", args.batch, args.lease, args.fetch_ms / 1000, deadline))
+        for i in range(args.workers)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started_at
+
+    processed = {}
+    for entry in log.find({}, {"product": 1, "worker": 1}):
+        processed.setdefault(entry["product"], []).append(entry["worker"])
+
+    duplicates = {product: owners for product, owners in processed.items() if len(owners) > 1}
+    missing = set(range(1, args.products + 1)) - set(processed)
+    per_worker = {}
+    for owners in processed.values():
+        for owner in owners:
+            per_worker[owner] = per_worker.get(owner, 0) + 1
+
+    print(f"{args.products} productos, {args.workers} {'procesos' if use_processes else 'hilos'}, {elapsed:.2f} s")
+    print("Productos por trabajador: " + ", ".join(f"{w}={n}" for w, n in sorted(per_worker.items())))
+    print(f"Retomados del trabajador caído: {len(abandoned & set(processed))} de {len(abandoned)}")
+    print(f"Duplicados: {len(duplicates)}, faltantes: {len(missing)}")
+
+    products.drop()
+    log.drop()
+    return 1 if duplicates or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
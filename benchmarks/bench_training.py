@@ -0,0 +1,87 @@
+"""
+Benchmark del entrenamiento por producto con distinto número de procesos.
+
+Entrena los modelos sobre datos sintéticos en serie y con 2, 4, ... procesos,
+reporta productos/s y la aceleración, y verifica que los resultados sean
+idénticos al entrenamiento en serie.
+
+Uso:
+  python -m benchmarks.bench_training [--products N] [--days D] [--workers 1,2,4]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import build_features, generate_price_history
+from model.training import FEATURE_COLUMNS, build_task, train_products
+
+
+def build_tasks(features):
+    tasks = []
+    for product_id, group in features.groupby("product_id"):
+        X = group[FEATURE_COLUMNS].to_numpy()
+        # Horizonte fijo: basta para medir el costo de predicción
+        X_future = np.repeat(X[-1:], 3, axis=0)
+        tasks.append(build_task(product_id, X, group["price"].to_numpy(), X_future))
+    return tasks
+
+
+def same_results(expected, actual):
+    if len(expected) != len(actual):
+        return False
+    for (pid_a, mae_a, rmse_a, fut_a, _), (pid_b, mae_b, rmse_b, fut_b, _) in zip(expected, actual):
+        if pid_a != pid_b or mae_a != mae_b or rmse_a != rmse_b or not np.array_equal(fut_a, fut_b):
+            return False
+    return True
+
+
+def default_workers():
+    cpus = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 <= cpus:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != cpus:
+        workers.append(cpus)
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del entrenamiento paralelo")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--workers", type=str, default=None, help="Lista separada por comas, p. ej. 1,2,4")
+    args = parser.parse_args()
+
+    workers_list = [int(w) for w in args.workers.split(",")] if args.workers else default_workers()
+
+    features, _ = build_features(generate_price_history(args.products, args.days))
+    tasks = build_tasks(features)
+
+    print(f"{len(tasks)} productos x {args.days} días")
+    print(f"{'procesos':>8}{'tiempo (s)':>12}{'productos/s':>14}{'aceleración':>13}")
+
+    serial_results = None
+    serial_elapsed = None
+    failures = 0
+
+    for workers in workers_list:
+        started_at = time.perf_counter()
+        results = train_products(tasks, workers=workers)
+        elapsed = time.perf_counter() - started_at
+
+        if serial_results is None:
+            serial_results, serial_elapsed = results, elapsed
+        elif not same_results(serial_results, results):
+            failures += 1
+            print(f"Los resultados con {workers} procesos difieren del primer resultado.")
+
+        print(f"{workers:>8}{elapsed:>12.2f}{len(tasks) / elapsed:>14.1f}{serial_elapsed / elapsed:>12.2f}x")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
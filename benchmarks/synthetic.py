@@ -0,0 +1,45 @@
+"""
+Generador de datos sintéticos para los benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+from model.features import add_calendar_features, add_rolling_features
+
+
+def generate_price_history(n_products, n_days, seed=0, start="2024-01-01 03:00:00"):
+    """
+    Genera un historial diario de precios con la forma de `scraping-data`
+    (precio y calificación como números; la marca de tiempo como datetime).
+    Cada producto sigue una caminata aleatoria con cambios de precio esporádicos.
+    """
+    rng = np.random.default_rng(seed)
+
+    product_ids = np.repeat(np.arange(1, n_products + 1), n_days)
+    day_offsets = np.tile(np.arange(n_days), n_products)
+    seconds = rng.integers(0, 3600, size=n_products * n_days)
+    timestamps = pd.Timestamp(start) + pd.to_timedelta(day_offsets, unit="D") + pd.to_timedelta(seconds, unit="s")
+
+    base_prices = rng.uniform(5, 500, size=n_products)
+    changes = rng.normal(0, 0.03, size=(n_products, n_days)) * (rng.random((n_products, n_days)) < 0.2)
+    prices = (base_prices[:, None] * np.exp(np.cumsum(changes, axis=1))).round(2).ravel()
+    ratings = np.repeat(rng.integers(30, 51, size=n_products) / 10, n_days)
+
+    return pd.DataFrame({
+        "product_id": product_ids,
+        "timestamp": timestamps,
+        "price": prices,
+        "rating": ratings,
+    })
+
+
+def build_features(history):
+    """
+    Calcula las características con las mismas funciones que el almacén de características del predictor.
+    """
+    data = history.sort_values(by=["product_id", "timestamp"]).reset_index(drop=True)
+    start_date = data["timestamp"].min()
+
+    data = add_rolling_features(data)
+    data = add_calendar_features(data, start_date)
+    return data, start_date
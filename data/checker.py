@@ -1,165 +1,284 @@
-import pandas as pd
-import numpy as np
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+import os
+import time
+import argparse
+from dotenv import load_dotenv
 
-from utils.database import connection, cursor
+from utils.database import mysql_connection
 
+load_dotenv()
 
-def update_real_prices():
+# Predicciones pendientes a partir de las cuales la conciliación se hace por lotes
+RECONCILE_CHUNK_THRESHOLD = int(os.getenv("RECONCILE_CHUNK_THRESHOLD", "50000"))
+RECONCILE_CHUNK_SIZE = int(os.getenv("RECONCILE_CHUNK_SIZE", "10000"))
+
+QUERY_PENDING_PREDICTIONS = """
+SELECT COUNT(*) AS pending, MIN(id) AS min_id, MAX(id) AS max_id
+FROM predictions
+WHERE real_price IS NULL;
+"""
+
+# Precio real del mismo día; el rango sobre s.timestamp permite usar el índice (product_id, timestamp)
+QUERY_UPDATE_REAL_PRICES = """
+UPDATE predictions p
+JOIN `scraping-data` s
+  ON s.product_id = p.product_id
+  AND s.timestamp >= DATE(p.timestamp)
+  AND s.timestamp < DATE(p.timestamp) + INTERVAL 1 DAY
+SET p.real_price = REPLACE(s.price, ',', '')
+WHERE p.real_price IS NULL
+"""
+
+QUERY_UPDATE_REAL_PRICES_RANGE = QUERY_UPDATE_REAL_PRICES + " AND p.id BETWEEN %s AND %s"
+
+QUERY_CLAIM_NEW_ERRORS = """
+UPDATE predictions
+SET error_applied = 2
+WHERE error_applied = 0 AND real_price IS NOT NULL
+"""
+
+QUERY_ADD_ERROR_AGGREGATES = """
+INSERT INTO error_aggregates (product_id, n, sum_abs_error, sum_sq_error)
+SELECT product_id, COUNT(*), SUM(ABS(real_price - predicted_price)), SUM(POW(real_price - predicted_price, 2))
+FROM predictions
+WHERE error_applied = 2
+GROUP BY product_id
+ON DUPLICATE KEY UPDATE
+  n = n + VALUES(n),
+  sum_abs_error = sum_abs_error + VALUES(sum_abs_error),
+  sum_sq_error = sum_sq_error + VALUES(sum_sq_error)
+"""
+
+QUERY_UPDATE_CHANGED_ERRORS = """
+UPDATE model_errors e
+JOIN (
+  SELECT DISTINCT product_id FROM predictions WHERE error_applied = 2
+) changed ON changed.product_id = e.product_id
+JOIN error_aggregates a ON a.product_id = e.product_id
+SET e.mae = a.sum_abs_error / a.n, e.rmse = SQRT(a.sum_sq_error / a.n)
+"""
+
+QUERY_UPDATE_TODAY_ERRORS = """
+UPDATE model_errors e
+JOIN error_aggregates a ON a.product_id = e.product_id
+SET e.mae = a.sum_abs_error / a.n, e.rmse = SQRT(a.sum_sq_error / a.n)
+WHERE e.error_date = CURDATE()
+"""
+
+# Ventana por producto: desde el último precio conocido anterior al primer hueco
+QUERY_FIX_NULL_WINDOW = """
+SELECT p.id, p.product_id, p.timestamp, p.real_price, p.predicted_price
+FROM predictions p
+JOIN (
+  SELECT gaps.product_id, COALESCE((
+    SELECT MAX(k.timestamp)
+    FROM predictions k
+    WHERE k.product_id = gaps.product_id
+      AND k.timestamp < gaps.first_gap
+      AND k.real_price IS NOT NULL
+  ), gaps.first_gap) AS window_start
+  FROM (
+    SELECT product_id, MIN(timestamp) AS first_gap
+    FROM predictions
+    WHERE real_price IS NULL AND timestamp <= NOW()
+    GROUP BY product_id
+  ) gaps
+) w ON w.product_id = p.product_id AND p.timestamp >= w.window_start
+WHERE p.timestamp <= NOW()
+ORDER BY p.product_id, p.timestamp
+"""
+
+
+def update_real_prices(chunk_threshold=RECONCILE_CHUNK_THRESHOLD, chunk_size=RECONCILE_CHUNK_SIZE):
   """
   Actualiza los precios reales en la tabla `predictions` 
   usando los datos de la tabla `scraping-data`.
+  La actualización se hace en SQL con un único UPDATE ... JOIN; si hay más de
+  `chunk_threshold` predicciones pendientes se procesa por rangos de `chunk_size` ids.
+  Devuelve un diccionario con los conteos y la duración.
   """
-  # Query para obtener predicciones sin precios reales
-  query_select_predictions = """
-  SELECT id, product_id, timestamp 
-  FROM predictions 
-  WHERE real_price IS NULL;
-  """
-  
-  # Query para obtener precios reales desde `scraping-data`
-  query_select_real_prices = """
-  SELECT product_id, timestamp, price AS real_price
-  FROM `scraping-data`
-  WHERE (product_id) IN (
-    SELECT product_id 
-    FROM predictions 
-    WHERE real_price IS NULL
-  );
-  """
-  
-  # Query para actualizar la columna `real_price`
-  query_update = """
-  UPDATE predictions
-  SET real_price = %s
-  WHERE id = %s;
-  """
-  
+  started_at = time.monotonic()
+  stats = {"pending": 0, "updated": 0, "chunks": 0, "elapsed": 0.0}
+
   try:
-    # Leer predicciones sin precios reales
-    cursor.execute(query_select_predictions)
-    predictions_to_update = cursor.fetchall()
-    
-    if not predictions_to_update:
-      print("No hay predicciones pendientes de actualización.")
-      return
-    
-    print(f"Actualizando {len(predictions_to_update)} predicciones.")
-    
-    # Leer precios reales desde `scraping-data`
-    cursor.execute(query_select_real_prices)
-    real_prices = cursor.fetchall()
-
-    print(f"{len(real_prices)} Precios reales leídos.")
-    
-    # Mapear los precios reales por `product_id` y `timestamp`
-    real_prices_map = {
-      (record['product_id'], record['timestamp'].split(" ")[0]): record['real_price']
-      for record in real_prices
-    }
-    
-    # Actualizar los precios reales para las predicciones correspondientes
-    for prediction in predictions_to_update:
-      key = (prediction['product_id'], prediction['timestamp'].strftime('%Y-%m-%d'))
-      if key in real_prices_map:
-        real_price = real_prices_map[key]
-        print(f"Actualizando id={prediction['id']} con real_price={real_price}")
-        cursor.execute(query_update, (real_price, prediction['id']))
-    
-    connection.commit()
-    print("Precios reales actualizados correctamente.")
+    with mysql_connection() as connection:
+      cursor = connection.cursor()
+      cursor.execute(QUERY_PENDING_PREDICTIONS)
+      pending = cursor.fetchone()
+      stats["pending"] = pending["pending"]
+
+      if not stats["pending"]:
+        print("No hay predicciones pendientes de actualización.")
+        return stats
+
+      if stats["pending"] <= chunk_threshold:
+        stats["updated"] = cursor.execute(QUERY_UPDATE_REAL_PRICES)
+        stats["chunks"] = 1
+        connection.commit()
+      else:
+        # Rangos de ids: cada transacción bloquea un número acotado de filas
+        for first_id in range(pending["min_id"], pending["max_id"] + 1, chunk_size):
+          stats["updated"] += cursor.execute(
+            QUERY_UPDATE_REAL_PRICES_RANGE, (first_id, first_id + chunk_size - 1)
+          )
+          stats["chunks"] += 1
+          connection.commit()
+
   except Exception as e:
+    stats["error"] = str(e)
     print(f"Error actualizando precios reales: {e}")
 
+  stats["elapsed"] = time.monotonic() - started_at
+  print(
+    f"Precios reales actualizados: {stats['updated']} de {stats['pending']} predicciones pendientes "
+    f"en {stats['chunks']} lotes ({stats['elapsed']:.2f} s)."
+  )
+  return stats
+
 # Función para calcular el error con los precios reales
-def calculate_updated_errors():
+def calculate_updated_errors(rebuild=False):
   """
   Calcula el error comparando las predicciones con los precios reales.
   Actualiza la tabla `model_errors` con los nuevos valores de MAE y RMSE.
+  Mantiene por producto el conteo y las sumas de errores absolutos y cuadráticos en
+  `error_aggregates`, a las que solo se suman las predicciones conciliadas desde la
+  última ejecución. Con `rebuild=True` los agregados se recalculan desde cero.
   """
-  query_predictions = """
-  SELECT p.product_id, p.timestamp, p.predicted_price, p.real_price
-  FROM predictions p
-  WHERE p.real_price IS NOT NULL;
-  """
-  
+  started_at = time.monotonic()
+  stats = {"new_predictions": 0, "updated": 0, "elapsed": 0.0}
+
   try:
-    cursor.execute(query_predictions)
-    results = cursor.fetchall()
-
-    if not results:
-      print("No hay datos para calcular errores.")
-      return
-
-    print("Calculando errores actualizados...")
-    
-    # Convertir resultados a DataFrame
-    df = pd.DataFrame(results)
-    
-    # Calcular errores por producto
-    updated_errors = []
-    for product_id, group in df.groupby('product_id'):
-      mae = mean_absolute_error(group['real_price'], group['predicted_price'])
-      rmse = np.sqrt(mean_squared_error(group['real_price'], group['predicted_price']))
-      updated_errors.append({'product_id': product_id, 'mae': mae, 'rmse': rmse})
-    
-    # Actualizar tabla `model_errors`
-    update_query = """
-    UPDATE model_errors
-    SET mae = %s, rmse = %s
-    WHERE product_id = %s;
-    """
-    for error in updated_errors:
-      cursor.execute(update_query, (error['mae'], error['rmse'], error['product_id']))
-    connection.commit()
-    print("Errores actualizados correctamente.")
+    with mysql_connection() as connection:
+      cursor = connection.cursor()
+      if rebuild:
+        print("Reconstruyendo los agregados de errores...")
+        cursor.execute("DELETE FROM error_aggregates")
+        cursor.execute("UPDATE predictions SET error_applied = 0 WHERE error_applied <> 0")
+
+      # Reservar las predicciones conciliadas que aún no se sumaron
+      stats["new_predictions"] = cursor.execute(QUERY_CLAIM_NEW_ERRORS)
+
+      if stats["new_predictions"]:
+        cursor.execute(QUERY_ADD_ERROR_AGGREGATES)
+
+      # MAE y RMSE de los productos con datos nuevos y de los registros de errores de hoy
+      stats["updated"] = cursor.execute(QUERY_UPDATE_CHANGED_ERRORS)
+      stats["updated"] += cursor.execute(QUERY_UPDATE_TODAY_ERRORS)
+
+      cursor.execute("UPDATE predictions SET error_applied = 1 WHERE error_applied = 2")
+      connection.commit()
   except Exception as e:
+    stats["error"] = str(e)
     print(f"Error calculando errores actualizados: {e}")
-  # finally:
-  #   connection.close()
+    return stats
+
+  stats["elapsed"] = time.monotonic() - started_at
+  print(
+    f"Errores actualizados: {stats['new_predictions']} predicciones nuevas, "
+    f"{stats['updated']} registros de errores ({stats['elapsed']:.2f} s)."
+  )
+  return stats
+
+def rebuild_error_aggregates():
+  """
+  Recalcula los agregados de errores con todas las predicciones conciliadas.
+  """
+  return calculate_updated_errors(rebuild=True)
+
+def interpolate_by_product(df):
+  """
+  Interpola linealmente `real_price` dentro de cada producto con operaciones vectorizadas.
+  Igual que `Series.interpolate(method="linear")` por grupo: los huecos interiores se
+  interpolan por posición, los finales toman el último valor conocido y los iniciales quedan nulos.
+  `df` debe estar ordenado por product_id y timestamp.
+  """
+  by_product = df["product_id"]
+  known = df["real_price"].notna()
+  position = df.groupby("product_id").cumcount().astype(float)
+
+  known_position = position.where(known)
+  prev_value = df["real_price"].groupby(by_product).ffill()
+  next_value = df["real_price"].groupby(by_product).bfill()
+  prev_position = known_position.groupby(by_product).ffill()
+  next_position = known_position.groupby(by_product).bfill()
+
+  fraction = (position - prev_position) / (next_position - prev_position)
+  interpolated = prev_value + (next_value - prev_value) * fraction
+
+  # Sin valor conocido posterior se conserva el último conocido
+  interpolated = interpolated.where(next_value.notna(), prev_value)
+  return df["real_price"].where(known, interpolated)
+
+def bulk_update_real_prices(cursor, rows, batch_size=1000):
+  """
+  Actualiza `real_price` de las filas (id, real_price) con una sentencia UPDATE ... JOIN por lote.
+  """
+  updated = 0
+  for start in range(0, len(rows), batch_size):
+    batch = rows[start:start + batch_size]
+    values = " UNION ALL ".join(["SELECT %s AS id, %s AS real_price"] * len(batch))
+    updated += cursor.execute(f"""
+    UPDATE predictions p
+    JOIN ({values}) v ON v.id = p.id
+    SET p.real_price = v.real_price
+    """, [value for row in batch for value in row])
+  return updated
 
 def fix_null_prices():
-  query = """
-  SELECT * 
-  FROM predictions 
-  WHERE timestamp <= NOW()
   """
+  Completa los precios reales faltantes de las predicciones ya vencidas.
+  Solo lee, por producto, la ventana que va desde el último precio real conocido antes
+  del primer hueco hasta hoy, y solo escribe las filas cuyo valor cambió.
+  """
+  # pandas se importa aquí para que la conciliación y los errores no lo carguen
+  import pandas as pd
 
-  try:
-    cursor.execute(query)
-    results = cursor.fetchall()
+  started_at = time.monotonic()
+  stats = {"window_rows": 0, "updated": 0, "elapsed": 0.0}
 
-    df = pd.DataFrame(results)
-  except Exception as e:
-    print(f"Error: {e}")
+  with mysql_connection() as connection:
+    cursor = connection.cursor()
+    try:
+      cursor.execute(QUERY_FIX_NULL_WINDOW)
+      df = pd.DataFrame(cursor.fetchall(), columns=["id", "product_id", "timestamp", "real_price", "predicted_price"])
+    except Exception as e:
+      stats["error"] = str(e)
+      print(f"Error: {e}")
+      return stats
+
+    stats["window_rows"] = len(df)
+    if df.empty:
+      print("No hay precios reales faltantes.")
+      return stats
 
-  # Procesamiento de los datos
-  # Eliminar duplicados en 'product_id' y 'timestamp'
-  df = df.drop_duplicates(subset=["product_id", "timestamp"])
+    df["real_price"] = df["real_price"].astype(float)
+    df["predicted_price"] = df["predicted_price"].astype(float)
 
-  # Ordenar por 'product_id' y 'timestamp'
-  df = df.sort_values(by=["product_id", "timestamp"]).reset_index(drop=True)
+    # Interpolar valores de 'real_price' por cada 'product_id' y llenar los restantes con 'predicted_price'
+    fixed = interpolate_by_product(df).fillna(df["predicted_price"])
 
-  # Interpolar valores de 'real_price' por cada 'product_id'
-  df["real_price"] = (
-      df.groupby("product_id")["real_price"]
-      .apply(lambda group: group.interpolate(method="linear"))
-      .reset_index(drop=True)
+    # Solo las filas que antes no tenían precio real
+    changed = df["real_price"].isna() & fixed.notna()
+    rows = list(zip(df.loc[changed, "id"].astype(int).tolist(), fixed[changed].tolist()))
+
+    try:
+      stats["updated"] = bulk_update_real_prices(cursor, rows)
+      connection.commit()
+    except Exception as e:
+      connection.rollback()
+      stats["error"] = str(e)
+      print(f"Error actualizando precios reales: {e}")
+
+  stats["elapsed"] = time.monotonic() - started_at
+  print(
+    f"Precios reales completados: {len(rows)} filas de {stats['window_rows']} leídas "
+    f"({stats['elapsed']:.2f} s)."
   )
+  return stats
 
-  # Llenar valores restantes con 'predicted_price'
-  df["real_price"] = df["real_price"].fillna(df["predicted_price"])
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Tareas de mantenimiento de predicciones")
+  parser.add_argument("--rebuild-errors", action="store_true", help="Recalcula desde cero los agregados de errores")
+  args = parser.parse_args()
 
-  # Actualizar la tabla 'predictions' con los valores corregidos
-  update_query = """
-  UPDATE predictions
-  SET real_price = %s
-  WHERE id = %s;
-  """
-  try:
-    for index, row in df.iterrows():
-      cursor.execute(update_query, (row["real_price"], row["id"]))
-    connection.commit()
-    print("Precios reales actualizados correctamente.")
-  except Exception as e:
-    print(f"Error actualizando precios reales: {e}")
+  if args.rebuild_errors:
+    rebuild_error_aggregates()
@@ -1,92 +1,155 @@
 import os
+import time
 from dotenv import load_dotenv
 import pymysql
 from datetime import datetime, timedelta
 
+from utils.database import mysql_connection, MYSQL_DATABASE
+
 load_dotenv()
 
-# Configuración de MySQL
-MYSQL_HOST = os.getenv("MYSQL_HOST")
-MYSQL_USER = os.getenv("MYSQL_USER")
-MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
+# Base de datos de reportes donde vive la tabla de hechos
+PBI_DATABASE = os.getenv("PBI_DATABASE", "tita_pbi")
+
+# Días previos a la marca de agua que se vuelven a procesar para recoger
+# precios reales y errores que se completan después de la predicción
+ETL_LOOKBACK_DAYS = int(os.getenv("ETL_LOOKBACK_DAYS", "1"))
+# Tamaño en días de cada partición procesada en una transacción
+ETL_CHUNK_DAYS = int(os.getenv("ETL_CHUNK_DAYS", "7"))
+
+ETL_NAME = "fact_predictions"
+
+# Consulta para actualizar la tabla de hechos; los filtros son rangos sobre columnas indexadas
+ETL_QUERY = f"""
+INSERT INTO `{PBI_DATABASE}`.fact_predictions (
+  product_id,
+  scraped_date,
+  real_price,
+  predicted_price,
+  day,
+  month,
+  day_of_week,
+  days_since_start,
+  rating,
+  moving_avg_3,
+  moving_avg_7,
+  mae,
+  rmse
+)
+SELECT
+  p.product_id,
+  p.timestamp AS scraped_date,
+  p.real_price,
+  p.predicted_price,
+  p.day,
+  p.month,
+  p.day_of_week,
+  p.days_since_start,
+  p.rating,
+  p.moving_avg_3,
+  p.moving_avg_7,
+  e.mae,
+  e.rmse
+FROM
+  `{MYSQL_DATABASE}`.predictions p
+LEFT JOIN
+  `{MYSQL_DATABASE}`.model_errors e
+ON
+  e.product_id = p.product_id
+  AND e.error_date = DATE(p.timestamp)
+WHERE
+  p.timestamp >= %s AND p.timestamp < %s
+ON DUPLICATE KEY UPDATE
+  real_price = VALUES(real_price),
+  predicted_price = VALUES(predicted_price),
+  rating = VALUES(rating),
+  moving_avg_3 = VALUES(moving_avg_3),
+  moving_avg_7 = VALUES(moving_avg_7),
+  mae = VALUES(mae),
+  rmse = VALUES(rmse);
+"""
+
+ETL_COUNT_QUERY = f"""
+SELECT COUNT(*) AS total
+FROM `{MYSQL_DATABASE}`.predictions
+WHERE timestamp >= %s AND timestamp < %s
+"""
+
+ETL_WATERMARK_QUERY = f"""
+INSERT INTO `{PBI_DATABASE}`.etl_state (name, watermark)
+VALUES (%s, %s)
+ON DUPLICATE KEY UPDATE watermark = GREATEST(watermark, VALUES(watermark))
+"""
+
+
+def get_etl_watermark(cursor):
+  cursor.execute(f"SELECT watermark FROM `{PBI_DATABASE}`.etl_state WHERE name = %s", (ETL_NAME,))
+  state = cursor.fetchone()
+  return state['watermark'] if state else None
+
 
-# Conexión a MySQL
-config = {
-  'user': MYSQL_USER,
-  'password': MYSQL_PASSWORD,
-  'host': MYSQL_HOST,
-  'port': 3306,
-  "database": "tita_pbi",
-  'cursorclass': pymysql.cursors.DictCursor
-}
+def get_first_prediction_date(cursor):
+  cursor.execute(f"SELECT MIN(timestamp) AS first_timestamp FROM `{MYSQL_DATABASE}`.predictions")
+  result = cursor.fetchone()
+  first_timestamp = result['first_timestamp'] if result else None
+  return datetime.combine(first_timestamp.date(), datetime.min.time()) if first_timestamp else None
 
 
-def etl_update():
+def etl_update(start_date=None, end_date=None):
+  """
+  Actualiza la tabla de hechos `fact_predictions` de forma incremental e idempotente.
+  Procesa desde la marca de agua guardada (menos ETL_LOOKBACK_DAYS) hasta el final del día
+  actual, en particiones de ETL_CHUNK_DAYS días, con INSERT ... ON DUPLICATE KEY UPDATE.
+  `start_date` y `end_date` permiten recargar un rango explícito.
+  Devuelve un diccionario con las filas procesadas y la velocidad.
+  """
+  today = datetime.combine(datetime.now().date(), datetime.min.time())
+  stats = {"rows": 0, "chunks": 0, "elapsed": 0.0, "rows_per_second": 0.0}
+
+  started_at = time.monotonic()
+
   try:
-    # Conexión a la base de datos
-    conn = pymysql.connect(**config)
-    cursor = conn.cursor()
-
-    # Fecha de la última actualización
-    today = datetime.now().date()
-    yesterday = today - timedelta(days=1)
-
-    # Consulta para actualizar la tabla de hechos
-    etl_query = f"""
-    INSERT INTO fact_predictions (
-      product_id,
-      scraped_date,
-      real_price,
-      predicted_price,
-      day,
-      month,
-      day_of_week,
-      days_since_start,
-      rating,
-      moving_avg_3,
-      moving_avg_7,
-      mae,
-      rmse
-    )
-    SELECT 
-      p.product_id,
-      p.timestamp as scraped_date,
-      MAX(p.real_price) AS real_price,
-      MAX(p.predicted_price) AS predicted_price,
-      MAX(p.day) AS day,
-      MAX(p.month) AS month,
-      MAX(p.day_of_week) AS day_of_week,
-      MAX(p.days_since_start) AS days_since_start,
-      MAX(p.rating) AS rating,
-      MAX(p.moving_avg_3) AS moving_avg_3,
-      MAX(p.moving_avg_7) AS moving_avg_7,
-      mae,
-      rmse
-    FROM 
-      tita.predictions p
-    LEFT JOIN 
-      tita.`scraping-data` s  
-    ON 
-      p.product_id = s.product_id
-      AND DATE(p.timestamp) = DATE(s.timestamp)
-    LEFT JOIN 
-      tita.model_errors e ON p.product_id = e.product_id
-      and SUBSTRING(p.timestamp, 1, 10) = SUBSTRING(e.timestamp, 1, 10)
-    WHERE 
-      DATE(p.timestamp) BETWEEN '{yesterday}' AND '{today}'
-    GROUP BY 
-        p.timestamp, p.product_id;
-    """
-
-    # Ejecutar la consulta
-    cursor.execute(etl_query)
-    conn.commit()
-    print(f"Tabla de hechos actualizada con éxito para el rango {yesterday} - {today}")
+    with mysql_connection() as connection:
+      cursor = connection.cursor()
+      if end_date is None:
+        end_date = today + timedelta(days=1)
+
+      if start_date is None:
+        watermark = get_etl_watermark(cursor)
+        if watermark is not None:
+          start_date = min(watermark, end_date) - timedelta(days=ETL_LOOKBACK_DAYS)
+        else:
+          # Primera ejecución: carga completa desde la primera predicción
+          start_date = get_first_prediction_date(cursor) or today - timedelta(days=ETL_LOOKBACK_DAYS)
+
+      chunk_start = start_date
+      while chunk_start < end_date:
+        chunk_end = min(chunk_start + timedelta(days=ETL_CHUNK_DAYS), end_date)
+
+        cursor.execute(ETL_COUNT_QUERY, (chunk_start, chunk_end))
+        rows = cursor.fetchone()['total']
+
+        if rows:
+          cursor.execute(ETL_QUERY, (chunk_start, chunk_end))
+        cursor.execute(ETL_WATERMARK_QUERY, (ETL_NAME, chunk_end))
+        connection.commit()
+
+        stats["rows"] += rows
+        stats["chunks"] += 1
+        chunk_start = chunk_end
+
+      stats["elapsed"] = time.monotonic() - started_at
+      stats["rows_per_second"] = stats["rows"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+      print(
+        f"Tabla de hechos actualizada con éxito para el rango {start_date:%Y-%m-%d} - {end_date:%Y-%m-%d}: "
+        f"{stats['rows']} filas en {stats['chunks']} particiones ({stats['rows_per_second']:.0f} filas/s)"
+      )
 
   except pymysql.MySQLError as err:
+    stats["error"] = str(err)
     print(f"Error: {err}")
   except Exception as e:
+    stats["error"] = str(e)
     print(f"Error en el proceso ETL: {e}")
-  finally:
-    cursor.close()
-    conn.close()
\ No newline at end of file
+
+  return stats
@@ -1,4 +1,157 @@
-from utils.scheduler import start_scheduler
+"""
+Punto de entrada del proceso diario.
+
+  python main.py                      # programador (SCHEDULER_MODE)
+  python main.py scrape [--passes N] [--mode sequential|concurrent]
+  python main.py predict | reconcile | fix | errors [--rebuild] | etl [--start AAAA-MM-DD] [--end AAAA-MM-DD]
+  python main.py run-dag              # pipeline completo una vez
+  python main.py import-times [trabajo ...] [--top N]
+
+Cada subcomando importa solo los módulos del trabajo que ejecuta y las conexiones se
+abren en su primer uso, así que, por ejemplo, `etl` no carga pandas ni scikit-learn ni
+necesita MongoDB.
+"""
+import argparse
+import importlib
+import subprocess
+import sys
+from datetime import datetime
+
+# Trabajo: (módulo, función). Los módulos se importan al ejecutar el trabajo
+JOBS = {
+    "scheduler": ("utils.scheduler", "start_scheduler"),
+    "scrape": ("utils.scheduler", "scrape_passes"),
+    "predict": ("model.predicter", "daily_prediction"),
+    "reconcile": ("data.checker", "update_real_prices"),
+    "fix": ("data.checker", "fix_null_prices"),
+    "errors": ("data.checker", "calculate_updated_errors"),
+    "etl": ("data.updater", "etl_update"),
+    "run-dag": ("utils.scheduler", "run_pipeline"),
+}
+
+
+def load_job(name):
+    module_name, function_name = JOBS[name]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def job_arguments(args):
+    """
+    Argumentos de la línea de comandos que recibe la función del trabajo.
+    """
+    if args.command == "scrape":
+        return {"passes": args.passes, "mode": args.mode}
+    if args.command == "errors":
+        return {"rebuild": args.rebuild}
+    if args.command == "etl":
+        return {"start_date": args.start, "end_date": args.end}
+    return {}
+
+
+def run_job(args):
+    from utils.database import close_connections
+    from utils.metrics import configure_logging, track_job
+
+    configure_logging()
+    job = track_job(args.command, load_job(args.command))
+    try:
+        result = job(**job_arguments(args))
+    finally:
+        close_connections()
+
+    return 1 if isinstance(result, dict) and result.get("error") else 0
+
+
+def import_times(modules):
+    """
+    Importa `modules` en un intérprete nuevo con `-X importtime` y devuelve
+    [(módulo, propio en ms, acumulado en ms)] en orden de importación.
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(own) / 1000, int(cumulative) / 1000))
+    return times
+
+
+def report_import_times(jobs, top):
+    """
+    Mide el arranque en frío de cada trabajo: tiempo total de importación y los
+    módulos de primer nivel que más tardan.
+    """
+    # Módulos que el intérprete ya carga al arrancar
+    startup = {module for module, _, _ in import_times([])}
+
+    for name in jobs or [job for job in JOBS if job != "scheduler"]:
+        module_name = JOBS[name][0]
+        times = [entry for entry in import_times([module_name]) if entry[0] not in startup]
+        total = next(cumulative for module, _, cumulative in times if module == module_name)
+        print(f"{name} ({module_name}): {total:.0f} ms en {len(times)} módulos")
+
+        # Paquetes de primer nivel y el módulo del trabajo
+        roots = {}
+        for module, _, cumulative in times:
+            if module == module.split(".")[0] or module == module_name:
+                roots[module] = max(roots.get(module, 0.0), cumulative)
+        for module, cumulative in sorted(roots.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {module:<32}{cumulative:>10.0f} ms")
+    return 0
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Trabajos del proceso diario")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("scheduler", help="Programador de trabajos (modo SCHEDULER_MODE)")
+
+    scrape = commands.add_parser("scrape", help="Scraping de los productos")
+    scrape.add_argument("--passes", type=int, default=None, help="Pasadas de scraping (SCRAPING_PASSES)")
+    scrape.add_argument("--mode", choices=["sequential", "concurrent"], default=None, help="Modo de scraping (SCRAPING_MODE)")
+
+    commands.add_parser("predict", help="Predicción diaria")
+    commands.add_parser("reconcile", help="Conciliación de precios reales")
+    commands.add_parser("fix", help="Completar precios reales faltantes")
+
+    errors = commands.add_parser("errors", help="Actualizar MAE y RMSE")
+    errors.add_argument("--rebuild", action="store_true", help="Recalcula desde cero los agregados de errores")
+
+    etl = commands.add_parser("etl", help="Actualizar la tabla de hechos")
+    etl.add_argument("--start", type=parse_date, default=None, help="Inicio del rango a recargar (AAAA-MM-DD)")
+    etl.add_argument("--end", type=parse_date, default=None, help="Fin del rango a recargar (AAAA-MM-DD)")
+
+    commands.add_parser("run-dag", help="Ejecutar el pipeline completo una vez")
+
+    times = commands.add_parser("import-times", help="Tiempo de importación de cada trabajo")
+    times.add_argument("jobs", nargs="*", help=f"Trabajos a medir: {', '.join(JOBS)} (todos por defecto)")
+    times.add_argument("--top", type=int, default=8, help="Módulos mostrados por trabajo")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "import-times":
+        unknown = [job for job in args.jobs if job not in JOBS]
+        if unknown:
+            parser.error(f"trabajos desconocidos: {', '.join(unknown)}")
+        return report_import_times(args.jobs, args.top)
+
+    if args.command is None or args.command == "scheduler":
+        load_job("scheduler")()
+        return 0
+    return run_job(args)
+
 
 if __name__ == "__main__":
-    start_scheduler()
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sklearn.ensemble import HistGradientBoostingRegressor
+from model.registry import ModelRegistry
+from model.training import FEATURE_COLUMNS, PREDICTION_WORKERS, RANDOM_STATE, build_task, train_products
+from utils import metrics
+
+load_dotenv()
+
+# Motor de predicción: "per_product" (un bosque por producto) o "global" (un modelo para todos)
+PREDICTION_ENGINE = os.getenv("PREDICTION_ENGINE", "per_product")
+
+GLOBAL_FEATURE_COLUMNS = FEATURE_COLUMNS + ['price_level']
+
+# Con el motor por producto cada observación es un modelo; con el global, el único entrenamiento
+fit_seconds_by_product = metrics.histogram("model_fit_seconds", "Duración del entrenamiento de cada modelo por motor")
+
+
+def errors_by_product(product_ids, real, predicted):
+  """
+  Calcula MAE y RMSE por producto de forma vectorizada.
+  """
+  diff = pd.DataFrame({'product_id': product_ids, 'abs': np.abs(real - predicted), 'sq': (real - predicted) ** 2})
+  errors = diff.groupby('product_id', sort=True).agg(mae=('abs', 'mean'), rmse=('sq', 'mean')).reset_index()
+  errors['rmse'] = np.sqrt(errors['rmse'])
+  return errors
+
+
+class PerProductEngine:
+  """
+  Entrena un RandomForest por producto, en paralelo y reutilizando el registro de modelos.
+  """
+  name = "per_product"
+  # Cada producto se entrena por separado: admite grupos de productos leídos en streaming
+  streaming = True
+
+  def __init__(self, registry=None, workers=None):
+    self.registry = registry
+    self.workers = PREDICTION_WORKERS if workers is None else workers
+    self.fit_seconds = 0.0
+
+  def predict(self, data, future):
+    """
+    Entrena con `data` y predice las filas de `future`.
+    Devuelve (predicciones alineadas con `future`, DataFrame de errores por producto).
+    """
+    future_positions = future.groupby('product_id').indices
+    future_X = future[FEATURE_COLUMNS].to_numpy()
+    tasks = []
+    fingerprints = []
+
+    for product_id, group in data.groupby('product_id'):
+      positions = future_positions.get(product_id, np.array([], dtype=int))
+
+      load_path, save_path = None, None
+      fingerprint = (len(group), group['timestamp'].max().isoformat())
+      if self.registry is not None:
+        # Reutilizar el modelo guardado si los datos del producto no cambiaron lo suficiente
+        load_path, save_path = self.registry.lookup(product_id, *fingerprint)
+
+      fingerprints.append((positions, fingerprint, save_path))
+      tasks.append(build_task(product_id, group[FEATURE_COLUMNS].to_numpy(), group['price'].to_numpy(), future_X[positions], load_path, save_path))
+
+    print(f"Entrenando {len(tasks)} modelos con {self.workers} procesos...")
+    results = train_products(tasks, workers=self.workers)
+
+    predictions = np.full(len(future), np.nan)
+    errors = []
+    for (positions, fingerprint, save_path), result in zip(fingerprints, results):
+      product_id, mae, rmse, future_predictions, fit_seconds = result
+      if len(positions):
+        predictions[positions] = future_predictions
+      errors.append({'product_id': product_id, 'mae': mae, 'rmse': rmse})
+      self.fit_seconds += fit_seconds
+      if fit_seconds:
+        # Los modelos reutilizados del registro no se entrenan
+        fit_seconds_by_product.observe(fit_seconds, engine=self.name)
+      if self.registry is not None:
+        self.registry.record(product_id, *fingerprint, save_path, fit_seconds)
+
+    return predictions, pd.DataFrame(errors, columns=['product_id', 'mae', 'rmse'])
+
+  def finish(self):
+    """
+    Guarda el índice del registro de modelos y devuelve un resumen de la ejecución.
+    """
+    if self.registry is None:
+      return f"Motor por producto: {self.fit_seconds:.1f} s entrenando."
+
+    registry = self.registry
+    evicted = registry.save()
+    return (
+      f"Caché de modelos: {registry.hit_rate():.1%} de aciertos ({registry.hits}/{registry.hits + registry.misses}), "
+      f"{registry.fit_seconds:.1f} s entrenando, {registry.saved_seconds:.1f} s ahorrados, {evicted} modelos descartados."
+    )
+
+
+class GlobalEngine:
+  """
+  Entrena un único modelo con todos los productos.
+  El precio se modela relativo al nivel de precio de cada producto, de modo que
+  productos de escalas distintas comparten el mismo modelo; la inferencia del
+  horizonte de todos los productos se hace en una sola llamada a `predict`.
+  """
+  name = "global"
+  streaming = False
+
+  def __init__(self, max_iter=300):
+    self.max_iter = max_iter
+    self.fit_seconds = 0.0
+
+  def prepare(self, frame, price_level):
+    X = frame[FEATURE_COLUMNS].copy()
+    X['price_level'] = frame['product_id'].map(price_level).to_numpy()
+    X['moving_avg_3'] = X['moving_avg_3'] / X['price_level']
+    X['moving_avg_7'] = X['moving_avg_7'] / X['price_level']
+    return X[GLOBAL_FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+  def predict(self, data, future):
+    """
+    Entrena con `data` y predice las filas de `future`.
+    Devuelve (predicciones alineadas con `future`, DataFrame de errores por producto).
+    """
+    price_level = data.groupby('product_id')['price'].mean()
+    level = data['product_id'].map(price_level).to_numpy()
+
+    X = self.prepare(data, price_level)
+    y = data['price'].to_numpy(dtype=np.float64) / level
+
+    started_at = time.perf_counter()
+    model = HistGradientBoostingRegressor(max_iter=self.max_iter, random_state=RANDOM_STATE)
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - started_at
+    self.fit_seconds += fit_seconds
+    fit_seconds_by_product.observe(fit_seconds, engine=self.name)
+
+    # Predicciones históricas para evaluar el error por producto
+    historical = model.predict(X) * level
+    errors = errors_by_product(data['product_id'].to_numpy(), data['price'].to_numpy(dtype=np.float64), historical)
+
+    predictions = model.predict(self.prepare(future, price_level)) * future['product_id'].map(price_level).to_numpy()
+    return predictions, errors
+
+  def finish(self):
+    """
+    Devuelve un resumen de la ejecución.
+    """
+    return f"Motor global: {self.fit_seconds:.1f} s entrenando."
+
+
+def get_engine(name=None):
+  """
+  Devuelve el motor configurado en PREDICTION_ENGINE.
+  """
+  name = name or PREDICTION_ENGINE
+
+  if name == "per_product":
+    return PerProductEngine(registry=ModelRegistry())
+  if name == "global":
+    return GlobalEngine()
+  raise ValueError(f"Motor de predicción desconocido: {name}")
@@ -0,0 +1,275 @@
+import os
+import numpy as np
+import pandas as pd
+import pymysql
+from dotenv import load_dotenv
+from model.training import FEATURE_COLUMNS
+
+load_dotenv()
+
+FEATURE_STORE_NAME = "product_features"
+
+# Filas leídas por viaje del cursor de servidor y productos completos por grupo de entrenamiento
+FEATURE_FETCH_ROWS = int(os.getenv("FEATURE_FETCH_ROWS", "50000"))
+FEATURE_GROUP_PRODUCTS = int(os.getenv("FEATURE_GROUP_PRODUCTS", "500"))
+# Segundos que MySQL espera a que el cliente lea mientras se entrena un grupo
+FEATURE_STREAM_TIMEOUT = int(os.getenv("FEATURE_STREAM_TIMEOUT", "3600"))
+# Horas anteriores a la marca de agua que se vuelven a leer: recogen las filas con marca de tiempo
+# antigua que se guardaron después (lotes del sink, otros trabajadores)
+FEATURE_WATERMARK_OVERLAP_HOURS = float(os.getenv("FEATURE_WATERMARK_OVERLAP_HOURS", "24"))
+
+QUERY_FEATURES = """
+SELECT product_id, timestamp, price, rating, day, month, day_of_week, days_since_start, moving_avg_3, moving_avg_7
+FROM product_features
+ORDER BY product_id, timestamp
+"""
+
+# Filas de `scraping-data` para el almacén: todas en la primera carga y luego solo las posteriores a la marca de agua
+QUERY_SCRAPING_ROWS = """
+SELECT product_id, timestamp, price, rating
+FROM `scraping-data`
+ORDER BY product_id, timestamp
+"""
+
+QUERY_NEW_SCRAPING_ROWS = """
+SELECT product_id, timestamp, price, rating
+FROM `scraping-data`
+WHERE timestamp > %s
+ORDER BY product_id, timestamp
+"""
+
+# Últimas filas de cada producto hasta una fecha; {placeholders} se reemplaza por un %s por producto
+QUERY_ROLLING_CONTEXT = """
+SELECT product_id, timestamp, price
+FROM (
+  SELECT product_id, timestamp, price,
+    ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY timestamp DESC) AS row_num
+  FROM product_features
+  WHERE product_id IN ({placeholders}) AND timestamp <= %s
+) AS recent
+WHERE row_num <= %s
+"""
+
+# Tipos compactos del almacén: sus columnas FLOAT ya son de precisión simple
+FEATURE_DTYPES = {
+  'product_id': 'int32',
+  'price': 'float32',
+  'rating': 'float32',
+  'day': 'int8',
+  'month': 'int8',
+  'day_of_week': 'int8',
+  'days_since_start': 'int32',
+  'moving_avg_3': 'float32',
+  'moving_avg_7': 'float32',
+}
+
+# Filas previas por producto necesarias para el promedio móvil más largo
+ROLLING_CONTEXT_ROWS = 6
+
+def to_number(series):
+  """
+  Convierte precios y calificaciones guardados como texto ("1,299.99") a números.
+  """
+  return pd.to_numeric(series.astype(str).str.replace(',', '', regex=False), errors='coerce')
+
+def add_rolling_features(df):
+  """
+  Calcula los promedios móviles por producto con groupby-rolling vectorizado.
+  `df` debe estar ordenado por product_id y timestamp.
+  """
+  grouped = df.groupby('product_id', sort=False)['price']
+  df['moving_avg_3'] = grouped.rolling(window=3, min_periods=1).mean().reset_index(level=0, drop=True)
+  df['moving_avg_7'] = grouped.rolling(window=7, min_periods=1).mean().reset_index(level=0, drop=True)
+  return df
+
+def add_calendar_features(df, start_date):
+  df['day'] = df['timestamp'].dt.day
+  df['month'] = df['timestamp'].dt.month
+  df['day_of_week'] = df['timestamp'].dt.dayofweek
+  df['days_since_start'] = (df['timestamp'] - start_date).dt.days
+  return df
+
+def build_future_frame(data, start_date, horizon=3, today=None):
+  """
+  Construye en una sola operación las filas de los próximos `horizon` días de todos los productos.
+  Usa la calificación media y los promedios de los últimos 3 y 7 precios de cada producto.
+  Los días se cuentan desde `today` (hoy por defecto) también para los productos que no se
+  descargaron hoy, conservando la hora de su última descarga.
+  `data` debe estar ordenado por product_id y timestamp.
+  """
+  today = pd.Timestamp.now().normalize() if today is None else pd.Timestamp(today).normalize()
+  grouped = data.groupby('product_id', sort=True)
+  last = grouped.agg(last_date=('timestamp', 'max'), rating=('rating', 'mean'))
+  # Los productos omitidos por el plan de descargas adaptativo tienen su último precio en días anteriores
+  days_behind = (today - last['last_date'].dt.normalize()).dt.days.clip(lower=0)
+  last['last_date'] += pd.to_timedelta(days_behind, unit='D')
+  last['moving_avg_3'] = grouped.tail(3).groupby('product_id')['price'].mean()
+  last['moving_avg_7'] = grouped.tail(7).groupby('product_id')['price'].mean()
+
+  future = last.loc[last.index.repeat(horizon)].reset_index()
+  offsets = np.tile(np.arange(1, horizon + 1), len(last))
+  future['timestamp'] = future['last_date'] + pd.to_timedelta(offsets, unit='D')
+  future = add_calendar_features(future.drop(columns=['last_date']), start_date)
+  return future
+
+def get_feature_state(cursor):
+  """
+  Devuelve (watermark, start_date) del almacén de características o (None, None) si está vacío.
+  """
+  cursor.execute("SELECT watermark, start_date FROM feature_state WHERE name = %s", (FEATURE_STORE_NAME,))
+  state = cursor.fetchone()
+  if state is None:
+    return None, None
+  return pd.Timestamp(state['watermark']), pd.Timestamp(state['start_date'])
+
+def load_rolling_context(cursor, product_ids, until):
+  """
+  Lee las últimas filas guardadas de cada producto hasta `until` para continuar los promedios móviles.
+  """
+  if not product_ids:
+    return pd.DataFrame(columns=['product_id', 'timestamp', 'price'])
+
+  placeholders = ', '.join(['%s'] * len(product_ids))
+  cursor.execute(
+    QUERY_ROLLING_CONTEXT.format(placeholders=placeholders),
+    (*product_ids, until.strftime('%Y-%m-%d %H:%M:%S'), ROLLING_CONTEXT_ROWS)
+  )
+  return pd.DataFrame(cursor.fetchall(), columns=['product_id', 'timestamp', 'price'])
+
+def update_feature_store(connection):
+  """
+  Agrega al almacén de características las filas de `scraping-data` posteriores a la
+  marca de agua guardada y devuelve cuántas filas se agregaron o recalcularon.
+  Se vuelven a leer las FEATURE_WATERMARK_OVERLAP_HOURS horas anteriores a la marca de
+  agua para recoger las filas que se guardaron tarde; sus promedios móviles y los de las
+  filas posteriores se recalculan y el upsert las reemplaza.
+  """
+  cursor = connection.cursor()
+  watermark, start_date = get_feature_state(cursor)
+
+  since = None
+  if watermark is None:
+    cursor.execute(QUERY_SCRAPING_ROWS)
+  else:
+    since = watermark - pd.Timedelta(hours=FEATURE_WATERMARK_OVERLAP_HOURS)
+    cursor.execute(QUERY_NEW_SCRAPING_ROWS, (since.strftime('%Y-%m-%d %H:%M:%S'),))
+  new_rows = pd.DataFrame(cursor.fetchall(), columns=['product_id', 'timestamp', 'price', 'rating'])
+
+  if new_rows.empty:
+    print("No hay datos nuevos para el almacén de características.")
+    return 0
+
+  new_rows['timestamp'] = pd.to_datetime(new_rows['timestamp'])
+  new_watermark = new_rows['timestamp'].max()
+  if watermark is not None:
+    new_watermark = max(new_watermark, watermark)
+  new_rows['price'] = to_number(new_rows['price'])
+  new_rows['rating'] = to_number(new_rows['rating'])
+  new_rows = new_rows.dropna(subset=['price', 'rating'])
+  if new_rows.empty:
+    print("Las filas nuevas no tienen precio o calificación válidos.")
+    return 0
+  new_rows['is_new'] = True
+
+  if start_date is None:
+    start_date = new_rows['timestamp'].min()
+
+  # Solo las filas anteriores a la ventana releída: las de la ventana se recalculan
+  context = pd.DataFrame(columns=['product_id', 'timestamp', 'price'])
+  if since is not None:
+    context = load_rolling_context(cursor, new_rows['product_id'].unique().tolist(), since)
+  context['timestamp'] = pd.to_datetime(context['timestamp'])
+  context['price'] = context['price'].astype(float)
+  context['is_new'] = False
+
+  frames = [frame for frame in (context, new_rows) if not frame.empty]
+  data = pd.concat(frames, ignore_index=True)
+  data = data.sort_values(by=['product_id', 'timestamp']).reset_index(drop=True)
+  data = add_rolling_features(data)
+  data = data[data['is_new']].copy()
+  data = add_calendar_features(data, start_date)
+
+  rows = [
+    (int(r.product_id), r.timestamp.to_pydatetime(), float(r.price), float(r.rating), int(r.day), int(r.month),
+     int(r.day_of_week), int(r.days_since_start), float(r.moving_avg_3), float(r.moving_avg_7))
+    for r in data.itertuples(index=False)
+  ]
+
+  try:
+    if rows:
+      cursor.executemany("""
+      INSERT INTO product_features (product_id, timestamp, price, rating, day, month, day_of_week, days_since_start, moving_avg_3, moving_avg_7)
+      VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+      ON DUPLICATE KEY UPDATE price = VALUES(price), rating = VALUES(rating),
+        moving_avg_3 = VALUES(moving_avg_3), moving_avg_7 = VALUES(moving_avg_7)
+      """, rows)
+
+    cursor.execute("""
+    INSERT INTO feature_state (name, watermark, start_date)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE watermark = VALUES(watermark)
+    """, (FEATURE_STORE_NAME, new_watermark.to_pydatetime(), start_date.to_pydatetime()))
+
+    connection.commit()
+  except Exception:
+    connection.rollback()
+    raise
+
+  print(f"{len(rows)} filas nuevas o recalculadas en el almacén de características.")
+  return len(rows)
+
+def to_feature_frame(rows):
+  """
+  Convierte un bloque de filas (tuplas) del almacén en un DataFrame con tipos compactos.
+  """
+  data = pd.DataFrame.from_records(rows, columns=['product_id', 'timestamp', 'price'] + FEATURE_COLUMNS)
+  data['timestamp'] = pd.to_datetime(data['timestamp'])
+  return data.astype(FEATURE_DTYPES)
+
+def iter_feature_groups(connection, group_products=FEATURE_GROUP_PRODUCTS, fetch_rows=FEATURE_FETCH_ROWS):
+  """
+  Recorre el almacén con un cursor de servidor sin búfer y entrega DataFrames con
+  alrededor de `group_products` productos completos, ordenados por product_id y timestamp.
+  Solo se mantienen en memoria el grupo actual y un bloque de `fetch_rows` filas.
+  La conexión queda ocupada hasta consumir el generador.
+  """
+  cursor = connection.cursor(pymysql.cursors.SSCursor)
+  try:
+    # El servidor espera sin cortar la conexión mientras el cliente entrena un grupo
+    cursor.execute("SET SESSION net_write_timeout = %s", (FEATURE_STREAM_TIMEOUT,))
+    cursor.execute(QUERY_FEATURES)
+
+    pending = []
+    pending_products = 0
+    while True:
+      rows = cursor.fetchmany(fetch_rows)
+      if not rows:
+        break
+      chunk = to_feature_frame(rows)
+      pending.append(chunk)
+      pending_products += chunk['product_id'].nunique()
+      if pending_products <= group_products:
+        continue
+
+      # El último producto puede continuar en el siguiente bloque
+      data = pd.concat(pending, ignore_index=True)
+      complete = data['product_id'].to_numpy() != data['product_id'].iat[-1]
+      pending = [data[~complete].reset_index(drop=True)]
+      pending_products = 1
+      if complete.any():
+        yield data[complete].reset_index(drop=True)
+
+    if pending:
+      yield pd.concat(pending, ignore_index=True)
+  finally:
+    cursor.close()
+
+def load_features(connection):
+  """
+  Lee las características de todos los productos ordenadas por product_id y timestamp,
+  por bloques y con tipos compactos.
+  """
+  groups = list(iter_feature_groups(connection))
+  if not groups:
+    return to_feature_frame([])
+  return pd.concat(groups, ignore_index=True)
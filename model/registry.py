@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "model_cache")
+# Filas nuevas necesarias desde el último entrenamiento para volver a entrenar
+MODEL_REFIT_MIN_NEW_ROWS = int(os.getenv("MODEL_REFIT_MIN_NEW_ROWS", "1"))
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "10000"))
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+MODEL_CACHE_VERSIONS = int(os.getenv("MODEL_CACHE_VERSIONS", "2"))
+
+
+class ModelRegistry:
+  """
+  Registro de modelos en disco indexado por product_id.
+  Cada entrada guarda la huella de los datos con que se entrenó (filas y última marca de tiempo),
+  la duración del entrenamiento y las versiones guardadas. Los modelos menos usados se
+  descartan cuando se supera el número máximo de entradas o de bytes.
+  """
+
+  def __init__(self, directory=MODEL_CACHE_DIR, refit_min_new_rows=MODEL_REFIT_MIN_NEW_ROWS,
+               max_entries=MODEL_CACHE_MAX_ENTRIES, max_bytes=MODEL_CACHE_MAX_BYTES,
+               versions=MODEL_CACHE_VERSIONS):
+    self.directory = directory
+    self.refit_min_new_rows = max(1, refit_min_new_rows)
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.versions = max(1, versions)
+    self.index_path = os.path.join(directory, "index.json")
+    self.index = {}
+    self.hits = 0
+    self.misses = 0
+    self.saved_seconds = 0.0
+    self.fit_seconds = 0.0
+
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(self.index_path):
+      with open(self.index_path, encoding="utf-8") as f:
+        self.index = json.load(f)
+
+  def model_path(self, product_id, version):
+    return os.path.join(self.directory, str(product_id), f"v{version}.joblib")
+
+  def lookup(self, product_id, rows, last_timestamp):
+    """
+    Decide si se reutiliza el modelo guardado de un producto.
+    Devuelve (ruta a cargar, ruta donde guardar); solo una de las dos es distinta de None.
+    """
+    entry = self.index.get(str(product_id))
+
+    if entry is not None:
+      unchanged = entry["rows"] == rows and entry["last_timestamp"] == last_timestamp
+      new_rows = rows - entry["rows"]
+      path = self.model_path(product_id, entry["version"])
+      if (unchanged or 0 < new_rows < self.refit_min_new_rows) and os.path.exists(path):
+        return path, None
+
+    version = entry["version"] + 1 if entry is not None else 1
+    return None, self.model_path(product_id, version)
+
+  def record(self, product_id, rows, last_timestamp, save_path, fit_seconds):
+    """
+    Registra el resultado de un producto: un acierto si se reutilizó el modelo
+    o una nueva versión si se entrenó y guardó en `save_path`.
+    """
+    key = str(product_id)
+    entry = self.index.get(key)
+    now = time.time()
+
+    if save_path is None:
+      self.hits += 1
+      self.saved_seconds += entry["fit_seconds"]
+      entry["last_used"] = now
+      return
+
+    self.misses += 1
+    self.fit_seconds += fit_seconds
+    versions = (entry["versions"] if entry is not None else []) + [entry["version"] + 1 if entry else 1]
+
+    # Conservar solo las versiones más recientes del producto
+    for old_version in versions[:-self.versions]:
+      self.remove_file(self.model_path(product_id, old_version))
+    versions = versions[-self.versions:]
+
+    self.index[key] = {
+      "version": versions[-1],
+      "versions": versions,
+      "rows": rows,
+      "last_timestamp": last_timestamp,
+      "fit_seconds": fit_seconds,
+      "size": sum(self.file_size(self.model_path(product_id, version)) for version in versions),
+      "last_used": now,
+    }
+
+  def file_size(self, path):
+    try:
+      return os.path.getsize(path)
+    except FileNotFoundError:
+      return 0
+
+  def remove_file(self, path):
+    try:
+      os.remove(path)
+    except FileNotFoundError:
+      pass
+
+  def evict(self):
+    """
+    Descarta los productos usados hace más tiempo hasta cumplir los límites de entradas y bytes.
+    """
+    total_bytes = sum(entry["size"] for entry in self.index.values())
+    evicted = 0
+
+    for key, entry in sorted(self.index.items(), key=lambda item: item[1]["last_used"]):
+      if len(self.index) <= self.max_entries and total_bytes <= self.max_bytes:
+        break
+      shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+      total_bytes -= entry["size"]
+      del self.index[key]
+      evicted += 1
+
+    return evicted
+
+  def save(self):
+    """
+    Descarta las entradas sobrantes y guarda el índice de forma atómica.
+    """
+    evicted = self.evict()
+    tmp_path = self.index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+      json.dump(self.index, f)
+    os.replace(tmp_path, self.index_path)
+    return evicted
+
+  def hit_rate(self):
+    total = self.hits + self.misses
+    return self.hits / total if total else 0.0
@@ -0,0 +1,76 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+from dotenv import load_dotenv
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+load_dotenv()
+
+# Número de procesos para entrenar modelos; 1 entrena en serie en el proceso actual
+PREDICTION_WORKERS = int(os.getenv("PREDICTION_WORKERS", "1"))
+
+# Columnas de entrada de los modelos, en este orden
+FEATURE_COLUMNS = ['rating', 'day', 'month', 'day_of_week', 'days_since_start', 'moving_avg_3', 'moving_avg_7']
+
+N_ESTIMATORS = 100
+RANDOM_STATE = 42
+
+def build_task(product_id, X, y, X_future, load_path=None, save_path=None):
+  """
+  Empaqueta los datos de un producto como arreglos compactos para enviarlos a otro proceso.
+  Con `load_path` se reutiliza un modelo guardado; con `save_path` el modelo entrenado se guarda ahí.
+  """
+  return (
+    product_id,
+    np.ascontiguousarray(X, dtype=np.float64),
+    np.ascontiguousarray(y, dtype=np.float64),
+    np.ascontiguousarray(X_future, dtype=np.float64),
+    load_path,
+    save_path,
+  )
+
+def train_product(task):
+  """
+  Entrena (o carga) el modelo de un producto y devuelve
+  (product_id, mae, rmse, predicciones futuras, segundos de entrenamiento).
+  """
+  product_id, X, y, X_future, load_path, save_path = task
+  fit_seconds = 0.0
+
+  if load_path is not None:
+    model = joblib.load(load_path)
+  else:
+    started_at = time.perf_counter()
+    model = RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=RANDOM_STATE)
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - started_at
+
+    if save_path is not None:
+      os.makedirs(os.path.dirname(save_path), exist_ok=True)
+      joblib.dump(model, save_path)
+
+  # Predicciones históricas
+  predicted = model.predict(X)
+  mae = mean_absolute_error(y, predicted)
+  rmse = np.sqrt(mean_squared_error(y, predicted))
+
+  return product_id, mae, rmse, model.predict(X_future), fit_seconds
+
+def train_products(tasks, workers=None):
+  """
+  Entrena todos los productos y devuelve los resultados en el mismo orden que `tasks`.
+  Con más de un worker usa un pool de procesos; el resultado es idéntico al entrenamiento en serie.
+  """
+  workers = PREDICTION_WORKERS if workers is None else workers
+
+  if workers <= 1 or len(tasks) <= 1:
+    return [train_product(task) for task in tasks]
+
+  # Lotes para amortizar el envío entre procesos sin desbalancear la carga
+  chunksize = max(1, len(tasks) // (workers * 8))
+
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    return list(executor.map(train_product, tasks, chunksize=chunksize))
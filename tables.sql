@@ -10,7 +10,12 @@ CREATE TABLE predictions (
   days_since_start INT NOT NULL,
   rating FLOAT NOT NULL,
   moving_avg_3 FLOAT NOT NULL,
-  moving_avg_7 FLOAT NOT NULL
+  moving_avg_7 FLOAT NOT NULL,
+  error_applied TINYINT NOT NULL DEFAULT 0,
+  UNIQUE KEY uq_predictions_product_timestamp (product_id, timestamp),
+  KEY idx_predictions_real_price (real_price),
+  KEY idx_predictions_error_applied (error_applied),
+  KEY idx_predictions_timestamp (timestamp)
 );
 
 CREATE TABLE model_errors (
@@ -18,5 +23,70 @@ CREATE TABLE model_errors (
     product_id INT NOT NULL,
     mae FLOAT NOT NULL,
     rmse FLOAT NOT NULL,
-    timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+    timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    error_date DATE AS (DATE(timestamp)) STORED,
+    UNIQUE KEY uq_model_errors_product_date (product_id, error_date),
+    KEY idx_model_errors_error_date (error_date)
+);
+
+CREATE TABLE error_aggregates (
+  product_id INT PRIMARY KEY,
+  n INT NOT NULL,
+  sum_abs_error DOUBLE NOT NULL,
+  sum_sq_error DOUBLE NOT NULL,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE product_features (
+  product_id INT NOT NULL,
+  timestamp DATETIME NOT NULL,
+  price FLOAT NOT NULL,
+  rating FLOAT NOT NULL,
+  day INT NOT NULL,
+  month INT NOT NULL,
+  day_of_week INT NOT NULL,
+  days_since_start INT NOT NULL,
+  moving_avg_3 FLOAT NOT NULL,
+  moving_avg_7 FLOAT NOT NULL,
+  PRIMARY KEY (product_id, timestamp)
+);
+
+CREATE TABLE feature_state (
+  name VARCHAR(64) PRIMARY KEY,
+  watermark DATETIME NOT NULL,
+  start_date DATETIME NOT NULL
+);
+
+-- La tabla `scraping-data` se crea junto con la colección de MongoDB;
+-- estos índices permiten conciliar precios reales y leer los datos nuevos sin recorrerla completa.
+-- Las bases existentes se actualizan con `python -m utils.migrations migrate`.
+ALTER TABLE `scraping-data`
+  MODIFY timestamp DATETIME NOT NULL,
+  MODIFY price DECIMAL(12, 2) NULL,
+  MODIFY rating DECIMAL(3, 1) NULL;
+CREATE INDEX idx_scraping_data_product_timestamp ON `scraping-data` (product_id, timestamp);
+CREATE INDEX idx_scraping_data_timestamp ON `scraping-data` (timestamp);
+
+-- Base de datos de reportes (PBI_DATABASE, por defecto tita_pbi)
+CREATE TABLE fact_predictions (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  product_id INT NOT NULL,
+  scraped_date DATETIME NOT NULL,
+  real_price FLOAT DEFAULT NULL,
+  predicted_price FLOAT NOT NULL,
+  day INT NOT NULL,
+  month INT NOT NULL,
+  day_of_week INT NOT NULL,
+  days_since_start INT NOT NULL,
+  rating FLOAT NOT NULL,
+  moving_avg_3 FLOAT NOT NULL,
+  moving_avg_7 FLOAT NOT NULL,
+  mae FLOAT DEFAULT NULL,
+  rmse FLOAT DEFAULT NULL,
+  UNIQUE KEY uq_fact_predictions_product_date (product_id, scraped_date)
+);
+
+CREATE TABLE etl_state (
+  name VARCHAR(64) PRIMARY KEY,
+  watermark DATETIME NOT NULL
+);
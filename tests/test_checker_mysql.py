@@ -0,0 +1,180 @@
+"""
+Pruebas de integración de la conciliación de precios reales y de los planes de las
+consultas frecuentes contra un MySQL 8 local,
+por ejemplo `docker run -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=test mysql:8`.
+Se conectan con TEST_MYSQL_HOST/PORT/USER/PASSWORD (por defecto 127.0.0.1:3306, root, sin
+contraseña), crean bases desechables y se omiten si no hay servidor disponible.
+"""
+import os
+from datetime import datetime, timedelta
+
+import pymysql
+import pytest
+
+from data import updater
+from data.checker import update_real_prices
+from utils import database, migrations
+from utils.migrations import check_query_plans, migrate, read_schema
+
+TEST_DATABASE = "tita_test_checker"
+TEST_PBI_DATABASE = f"{TEST_DATABASE}_pbi"
+
+
+@pytest.fixture
+def mysql_pool(monkeypatch):
+    connect_args = {
+        "host": os.getenv("TEST_MYSQL_HOST", "127.0.0.1"),
+        "port": int(os.getenv("TEST_MYSQL_PORT", "3306")),
+        "user": os.getenv("TEST_MYSQL_USER", "root"),
+        "password": os.getenv("TEST_MYSQL_PASSWORD", ""),
+        "connect_timeout": 2,
+        "cursorclass": pymysql.cursors.DictCursor,
+    }
+    try:
+        admin = pymysql.connect(**connect_args)
+    except pymysql.MySQLError as e:
+        pytest.skip(f"MySQL no disponible: {e}")
+
+    main_statements, pbi_statements = read_schema()
+    cursor = admin.cursor()
+    for name, statements in ((TEST_DATABASE, main_statements), (TEST_PBI_DATABASE, pbi_statements)):
+        cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+        cursor.execute(f"CREATE DATABASE `{name}`")
+        cursor.execute(f"USE `{name}`")
+        for statement in statements:
+            cursor.execute(statement)
+    admin.commit()
+
+    pool = database.MySQLPool(size=2, database=TEST_DATABASE, **connect_args)
+    monkeypatch.setattr(database, "_mysql_pool", pool)
+    yield pool
+
+    pool.close()
+    for name in (TEST_DATABASE, TEST_PBI_DATABASE):
+        cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+    admin.close()
+
+
+def insert(pool, predictions, scraped):
+    with database.mysql_connection() as connection:
+        cursor = connection.cursor()
+        cursor.executemany("""
+        INSERT INTO predictions (product_id, timestamp, real_price, predicted_price, day, month, day_of_week,
+          days_since_start, rating, moving_avg_3, moving_avg_7)
+        VALUES (%s, %s, %s, %s, 1, 1, 0, 0, 4.5, 10, 10)
+        """, predictions)
+        cursor.executemany("""
+        INSERT INTO `scraping-data` (_id, product_id, title, rating, price, url, timestamp)
+        VALUES (%s, %s, 'producto', 4.5, %s, 'https://example.com', %s)
+        """, [(f"{index:024x}", *row) for index, row in enumerate(scraped)])
+        connection.commit()
+
+
+def real_prices(pool):
+    with database.mysql_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT product_id, timestamp, real_price FROM predictions ORDER BY product_id, timestamp")
+        return {(row["product_id"], row["timestamp"].strftime("%Y-%m-%d")): row["real_price"] for row in cursor.fetchall()}
+
+
+def test_update_real_prices_matches_same_day_only(mysql_pool):
+    insert(mysql_pool, [
+        (1, "2024-01-10 00:00:00", None, 10.0),   # precio del mismo día
+        (2, "2024-01-10 00:00:00", None, 20.0),   # solo hay precio del día siguiente
+        (3, "2024-01-10 00:00:00", 9.0, 30.0),    # ya conciliada
+    ], [
+        (1, 12.5, "2024-01-10 03:15:00"),
+        (2, 21.0, "2024-01-11 03:15:00"),
+        (3, 15.0, "2024-01-10 03:15:00"),
+    ])
+
+    stats = update_real_prices(chunk_threshold=100)
+
+    assert "error" not in stats
+    assert stats["pending"] == 2
+    assert stats["updated"] == 1
+    assert stats["chunks"] == 1
+    assert real_prices(mysql_pool) == {
+        (1, "2024-01-10"): pytest.approx(12.5),
+        (2, "2024-01-10"): None,
+        (3, "2024-01-10"): pytest.approx(9.0),
+    }
+
+
+def test_update_real_prices_by_id_ranges(mysql_pool):
+    predictions = [(product_id, f"2024-01-{day:02d} 00:00:00", None, 10.0) for product_id in (1, 2) for day in (10, 11, 12)]
+    scraped = [(product_id, 10.0 + product_id + day / 100, f"2024-01-{day:02d} 05:00:00") for product_id in (1, 2) for day in (10, 11)]
+    insert(mysql_pool, predictions, scraped)
+
+    stats = update_real_prices(chunk_threshold=0, chunk_size=2)
+
+    assert "error" not in stats
+    assert stats["pending"] == 6
+    assert stats["chunks"] == 3
+    assert stats["updated"] == 4
+    prices = real_prices(mysql_pool)
+    assert prices[(1, "2024-01-10")] == pytest.approx(11.10)
+    assert prices[(2, "2024-01-11")] == pytest.approx(12.11)
+    assert prices[(1, "2024-01-12")] is None
+    assert prices[(2, "2024-01-12")] is None
+
+
+def seed_history(pool, products=50, days=60):
+    """
+    Historial con la distribución de producción: casi todas las predicciones pasadas
+    conciliadas y con su error aplicado, y solo los últimos días pendientes.
+    """
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    predictions, scraped, features, errors = [], [], [], []
+    for product_id in range(1, products + 1):
+        for offset in range(-days, 3):
+            day = today + timedelta(days=offset)
+            reconciled = offset < -3
+            predictions.append((
+                product_id, day + timedelta(hours=3), 10.0 if reconciled else None, 10.5,
+                day.day, day.month, day.weekday(), days + offset, 1 if reconciled else 0
+            ))
+            if offset < 0:
+                scraped.append((f"{len(scraped):024x}", product_id, 10.0, day + timedelta(hours=3)))
+                features.append((product_id, day + timedelta(hours=3), 10.0, 4.5, day.day, day.month, day.weekday(), days + offset))
+                errors.append((product_id, 0.5, 0.5, day + timedelta(hours=4)))
+
+    with database.mysql_connection() as connection:
+        cursor = connection.cursor()
+        cursor.executemany("""
+        INSERT INTO predictions (product_id, timestamp, real_price, predicted_price, day, month, day_of_week,
+          days_since_start, rating, moving_avg_3, moving_avg_7, error_applied)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 4.5, 10, 10, %s)
+        """, predictions)
+        cursor.executemany("""
+        INSERT INTO `scraping-data` (_id, product_id, title, rating, price, url, timestamp)
+        VALUES (%s, %s, 'producto', 4.5, %s, 'https://example.com', %s)
+        """, scraped)
+        cursor.executemany("""
+        INSERT INTO product_features (product_id, timestamp, price, rating, day, month, day_of_week,
+          days_since_start, moving_avg_3, moving_avg_7)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 10, 10)
+        """, features)
+        cursor.executemany("INSERT INTO model_errors (product_id, mae, rmse, timestamp) VALUES (%s, %s, %s, %s)", errors)
+        cursor.execute("""
+        INSERT INTO error_aggregates (product_id, n, sum_abs_error, sum_sq_error)
+        SELECT product_id, COUNT(*), 0.5 * COUNT(*), 0.25 * COUNT(*) FROM predictions WHERE error_applied = 1 GROUP BY product_id
+        """)
+        connection.commit()
+        for table in ("predictions", "`scraping-data`", "product_features", "model_errors", "error_aggregates"):
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+
+
+def test_hot_queries_use_indexes_after_migrations(mysql_pool, monkeypatch):
+    # Las consultas del ETL y las migraciones nombran las bases configuradas
+    etl_query = updater.ETL_QUERY.replace(f"`{updater.MYSQL_DATABASE}`.", f"`{TEST_DATABASE}`.")
+    etl_query = etl_query.replace(f"`{updater.PBI_DATABASE}`.", f"`{TEST_PBI_DATABASE}`.")
+    monkeypatch.setattr(updater, "ETL_QUERY", etl_query)
+    monkeypatch.setattr(updater, "PBI_DATABASE", TEST_PBI_DATABASE)
+    monkeypatch.setattr(migrations, "MYSQL_DATABASE", TEST_DATABASE)
+
+    seed_history(mysql_pool)
+
+    assert migrate() == [version for version, _, _ in migrations.MIGRATIONS]
+    assert check_query_plans() == []
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import scraper
+from utils.concurrent_scraper import scrape_concurrently
+
+FIXTURE_PAGE = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures", "product_basic.html")
+# Solicitudes recibidas por el servidor de prueba, por ruta
+REQUESTS_BY_PATH = {}
+
+
+class ListSink:
+    day_index = None
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture(scope="module")
+def product_server():
+    with open(FIXTURE_PAGE, "rb") as f:
+        page = f.read()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            REQUESTS_BY_PATH[self.path] = REQUESTS_BY_PATH.get(self.path, 0) + 1
+            if self.path.startswith("/slow"):
+                time.sleep(1)
+            status, body = 200, page
+            if self.path.startswith("/empty"):
+                body = b"<html><body>Sin producto</body></html>"
+            elif self.path.startswith("/flaky") and REQUESTS_BY_PATH[self.path] == 1:
+                status, body = 503, b"Servicio no disponible"
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_scrapes_every_product_from_stub_server(product_server):
+    documents = [{"idProduct": i, "url": f"{product_server}/dp/{i}"} for i in range(1, 21)]
+    documents.append({"idProduct": None, "url": None})
+    sink = ListSink()
+
+    stats = scrape_concurrently(documents, sink, concurrency=4, rate_per_host=1000, burst=4)
+
+    assert stats["succeeded"] == 20
+    assert stats["failed"] == 0
+    assert stats["invalid"] == 1
+    assert sorted(record["product_id"] for record in sink.records) == list(range(1, 21))
+    assert all(record["price"] == "19.99" for record in sink.records)
+
+
+def test_stalled_host_times_out_and_gives_up(product_server, monkeypatch):
+    monkeypatch.setattr(scraper, "SCRAPING_READ_TIMEOUT", 0.2)
+    monkeypatch.setattr(scraper, "SCRAPING_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(scraper, "MAX_ATTEMPTS", 2)
+    sink = ListSink()
+    session = scraper.create_session(pool_size=2)
+
+    started_at = time.monotonic()
+    stats = scrape_concurrently([{"idProduct": 1, "url": f"{product_server}/slow/1"}], sink, concurrency=2,
+                                rate_per_host=1000, burst=2, session=session)
+
+    assert stats["failed"] == 1
+    assert not sink.records
+    assert time.monotonic() - started_at < 1.5
+    session.close()
+
+
+def test_extraction_errors_are_not_retried(product_server, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(scraper.time, "sleep", sleeps.append)
+    session = scraper.create_session(pool_size=1)
+
+    with pytest.raises(Exception):
+        scraper.scrape_product(f"{product_server}/empty/1", 1, session=session)
+    assert not scraper.scrape_and_store(f"{product_server}/empty/2", 2, session=session, sink=ListSink())
+
+    assert REQUESTS_BY_PATH["/empty/1"] == 1
+    assert REQUESTS_BY_PATH["/empty/2"] == 1
+    assert not sleeps
+    session.close()
+
+
+def test_server_errors_are_retried_with_backoff(product_server, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(scraper.time, "sleep", sleeps.append)
+    session = scraper.create_session(pool_size=1)
+
+    fields = scraper.scrape_product(f"{product_server}/flaky/1", 1, session=session)
+
+    assert fields["price"] == "19.99"
+    assert REQUESTS_BY_PATH["/flaky/1"] == 2
+    assert len(sleeps) == 1
+    session.close()
@@ -0,0 +1,54 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.leases import LeaseQueue
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def products():
+    collection = mongomock.MongoClient().db.products
+    collection.insert_many([{"idProduct": i, "url": f"https://example.com/dp/{i}"} for i in range(1, 7)])
+    return collection
+
+
+def test_claim_extends_leases_of_earlier_batches(products):
+    queue = LeaseQueue(products, worker_id="a", batch_size=2, lease_seconds=60, adaptive=False)
+    first = [doc["_id"] for doc in queue.claim_batch()]
+    # Reservas del primer lote a punto de vencer
+    products.update_many({"_id": {"$in": first}}, {"$set": {"lease_expires_at": datetime.now() + timedelta(seconds=1)}})
+
+    queue.claim_batch()
+
+    for doc in products.find({"_id": {"$in": first}}):
+        assert doc["lease_expires_at"] > datetime.now() + timedelta(seconds=30)
+
+
+def test_slow_product_keeps_its_lease(products):
+    queue = LeaseQueue(products, worker_id="a", batch_size=6, lease_seconds=0.4, adaptive=False)
+    other = LeaseQueue(products, worker_id="b", batch_size=6, lease_seconds=0.4, adaptive=False)
+
+    documents = queue.documents()
+    doc = next(documents)
+    # La descarga tarda más que la reserva: el hilo de renovación la mantiene
+    time.sleep(1.0)
+
+    assert other.claim_batch() == []
+    queue.complete(doc, True)
+    queue.close()
+    assert products.find_one({"_id": doc["_id"]})["last_crawled_at"] is not None
+
+
+def test_batches_do_not_overlap(products):
+    first = LeaseQueue(products, worker_id="a", batch_size=4, lease_seconds=60, adaptive=False)
+    second = LeaseQueue(products, worker_id="b", batch_size=4, lease_seconds=60, adaptive=False)
+
+    claimed_a = [doc["idProduct"] for doc in first.claim_batch()]
+    claimed_b = [doc["idProduct"] for doc in second.claim_batch()]
+
+    assert claimed_a == [1, 2, 3, 4]
+    assert claimed_b == [5, 6]
+    assert "last_crawled_at_1_lease_expires_at_1" in products.index_information()
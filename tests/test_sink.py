@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+
+import pymysql
+import pymysql.converters
+import pytest
+
+from utils import sink as sink_module
+from utils.sink import MYSQL_INSERT_QUERY, RecordSink
+
+
+class FakeConnection:
+    encoding = "utf8"
+
+    def escape(self, obj, mapping=None):
+        return pymysql.converters.escape_item(obj, "utf8")
+
+    def literal(self, obj):
+        return self.escape(obj)
+
+
+class RecordingCursor(pymysql.cursors.Cursor):
+    """
+    Cursor que guarda las sentencias en lugar de enviarlas al servidor.
+    """
+
+    def __init__(self):
+        super().__init__(FakeConnection())
+        self.statements = []
+
+    def _get_db(self):
+        return self.connection
+
+    def execute(self, query, args=None):
+        self.statements.append(query if args is None else self.mogrify(query, args))
+        return 1
+
+
+class FakeMySQL:
+    def cursor(self):
+        return RecordingCursor()
+
+    def commit(self):
+        pass
+
+
+def test_insert_query_is_batched_by_executemany():
+    assert pymysql.cursors.RE_INSERT_VALUES.match(MYSQL_INSERT_QUERY)
+
+    cursor = RecordingCursor()
+    rows = [(i, "título", 4.5, 19.99, f"https://example.com/dp/{i}", "2024-01-01 03:00:00", f"{i:024x}") for i in range(3)]
+    cursor.executemany(MYSQL_INSERT_QUERY, rows)
+
+    assert len(cursor.statements) == 1
+    statement = bytes(cursor.statements[0]).decode("utf8").strip()
+    assert statement.startswith("INSERT INTO `scraping-data`")
+    assert statement.count("),(") == 2
+
+
+def test_failed_mysql_batch_is_counted_and_released(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient().db.scraped
+    batches = []
+
+    @contextmanager
+    def flaky_connection():
+        batches.append(len(batches) + 1)
+        if len(batches) == 1:
+            raise pymysql.OperationalError(2013, "Lost connection to MySQL server during query")
+        yield FakeMySQL()
+
+    monkeypatch.setattr(sink_module, "mysql_connection", flaky_connection)
+    day_index = set()
+    results = []
+    records = [
+        {"product_id": i, "title": "título", "rating": "4.5", "price": "19.99",
+         "url": f"https://example.com/dp/{i}", "timestamp": "2024-01-01 03:00:00"}
+        for i in range(4)
+    ]
+
+    with RecordSink(flush_size=2, collection=collection, day_index=day_index,
+                    on_saved=lambda record, success: results.append((record["product_id"], success))) as sink:
+        for record in records:
+            sink.add(record)
+
+    assert sink.failed == 2
+    assert sink.written == 2
+    assert "MySQL" in sink.error
+    assert sorted(results) == [(0, False), (1, False), (2, True), (3, True)]
+    # El lote fallido se quita de MongoDB y del índice del día para reintentarlo
+    assert sorted(doc["product_id"] for doc in collection.find()) == [2, 3]
+    assert day_index == {2, 3}
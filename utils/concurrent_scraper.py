@@ -0,0 +1,95 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.metrics import sampled
+from utils.rate_limiter import HostRateLimiter
+from utils.scraper import create_session, scrape_product, store_product
+
+logger = logging.getLogger(__name__)
+
+def scrape_concurrently(documents, sink, concurrency=8, rate_per_host=2.0, burst=2, cache=None, leases=None, session=None):
+    """
+    Realiza el scraping de los documentos con un pool acotado de hilos.
+    Las descargas y la extracción se ejecutan en paralelo respetando un límite
+    de solicitudes por host; los registros se entregan al sink desde el hilo principal.
+    Los productos presentes en el índice del día del sink se omiten sin descargarlos.
+    Con `cache` las páginas se revalidan y guardan en la caché de respuestas.
+    Con `leases` se informa el resultado de cada documento a la cola de reservas; los
+    exitosos se completan cuando el sink guarda su lote.
+    Sin `session` se crea una sesión con `concurrency` conexiones y se cierra al terminar.
+    Devuelve un diccionario con las estadísticas de la ejecución.
+    """
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=concurrency)
+    rate_limiter = HostRateLimiter(rate_per_host, burst)
+    max_in_flight = concurrency * 4
+
+    stats = {"pages": 0, "succeeded": 0, "failed": 0, "invalid": 0, "skipped": 0}
+    started_at = time.monotonic()
+
+    def complete(doc, success):
+        if leases is not None:
+            leases.complete(doc, success)
+
+    def handle(future):
+        doc, url, id_product = pending.pop(future)
+        stats["pages"] += 1
+
+        try:
+            fields = future.result()
+            if fields is None:
+                raise ValueError("sin datos")
+            if leases is not None:
+                # Se completa cuando el sink guarda el lote del registro
+                leases.hold(doc)
+            if not store_product(url, id_product, fields, sink):
+                complete(doc, True)
+            stats["succeeded"] += 1
+        except Exception as e:
+            stats["failed"] += 1
+            complete(doc, False)
+            log, count = sampled("scrape_failed")
+            if log:
+                logger.warning("El scraping falló para el producto %s (%s). Verifica la URL: %s [%s fallas]", id_product, e, url, count)
+
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for doc in documents:
+            url = doc.get("url")
+            id_product = doc.get("idProduct")
+
+            if not (url and id_product):
+                stats["invalid"] += 1
+                complete(doc, True)
+                log, count = sampled("invalid_document")
+                if log:
+                    logger.warning("Documento inválido: %s [%s documentos inválidos]", doc, count)
+                continue
+
+            if sink.day_index is not None and id_product in sink.day_index:
+                stats["skipped"] += 1
+                complete(doc, True)
+                continue
+
+            # Limitar las tareas en vuelo para no cargar todo el cursor en memoria
+            while len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    handle(future)
+
+            future = executor.submit(scrape_product, url, id_product, session, rate_limiter, cache)
+            pending[future] = (doc, url, id_product)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                handle(future)
+
+    if own_session:
+        session.close()
+
+    stats["elapsed"] = time.monotonic() - started_at
+    stats["pages_per_second"] = stats["pages"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    return stats
@@ -0,0 +1,162 @@
+import os
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from utils.database import get_input_collection, mysql_connection
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Con CRAWL_ADAPTIVE=1 solo se descargan los productos vencidos según su frecuencia de cambios;
+# por defecto se descargan todos los productos en cada pasada
+CRAWL_ADAPTIVE = os.getenv("CRAWL_ADAPTIVE", "0") == "1"
+# Días de historial de `scraping-data` usados para medir la frecuencia de cambios de precio
+CRAWL_HISTORY_DAYS = int(os.getenv("CRAWL_HISTORY_DAYS", "30"))
+# Límites del intervalo entre descargas de un producto, en horas
+CRAWL_MIN_INTERVAL_HOURS = float(os.getenv("CRAWL_MIN_INTERVAL_HOURS", "20"))
+CRAWL_MAX_INTERVAL_HOURS = float(os.getenv("CRAWL_MAX_INTERVAL_HOURS", "168"))
+# Error relativo del modelo (MAE / precio medio) a partir del cual el producto se descarga con el intervalo mínimo
+CRAWL_ERROR_THRESHOLD = float(os.getenv("CRAWL_ERROR_THRESHOLD", "0.05"))
+# Máximo de productos por pasada (0 = sin límite)
+CRAWL_MAX_PER_RUN = int(os.getenv("CRAWL_MAX_PER_RUN", "0"))
+
+# Prioridad de los productos sin historial: se descargan antes que cualquier otro
+NEW_PRODUCT_PRIORITY = 10.0
+
+QUERY_PRICE_HISTORY = """
+SELECT product_id, COUNT(*) AS observations, SUM(price <> prev_price) AS changes,
+  SUM(TIMESTAMPDIFF(SECOND, prev_timestamp, timestamp)) / 3600 AS observed_hours,
+  AVG(price) AS avg_price, MAX(timestamp) AS last_seen
+FROM (
+  SELECT product_id, timestamp, price,
+    LAG(price) OVER (PARTITION BY product_id ORDER BY timestamp) AS prev_price,
+    LAG(timestamp) OVER (PARTITION BY product_id ORDER BY timestamp) AS prev_timestamp
+  FROM `scraping-data`
+  WHERE timestamp >= %s AND price IS NOT NULL
+) history
+GROUP BY product_id
+"""
+
+QUERY_RECENT_ERRORS = """
+SELECT product_id, AVG(mae) AS mae
+FROM model_errors
+WHERE error_date >= %s
+GROUP BY product_id
+"""
+
+
+def crawl_plan(history, errors, now):
+    """
+    Calcula el plan de descarga de cada producto con historial.
+    La volatilidad son los cambios de precio por día de historial observado, medidos con las
+    horas transcurridas entre observaciones consecutivas, así que no depende de la frecuencia
+    con que se descargó el producto; el intervalo es la mitad del tiempo esperado hasta el
+    próximo cambio, acotado entre
+    CRAWL_MIN_INTERVAL_HOURS y CRAWL_MAX_INTERVAL_HOURS. Los productos cuyo modelo
+    se equivoca más que CRAWL_ERROR_THRESHOLD usan el intervalo mínimo.
+    Devuelve {product_id: (next_due_at, prioridad, volatilidad, intervalo en horas)}.
+    """
+    plan = {}
+    for row in history:
+        product_id = int(row["product_id"])
+        changes = int(row["changes"] or 0)
+        observed_hours = float(row["observed_hours"] or 0)
+        volatility = changes * 24.0 / observed_hours if observed_hours > 0 else 1.0
+
+        avg_price = float(row["avg_price"] or 0)
+        mae = errors.get(product_id)
+        relative_error = mae / avg_price if mae is not None and avg_price > 0 else 0.0
+
+        if volatility > 0:
+            interval = 24.0 / volatility / 2
+        else:
+            interval = CRAWL_MAX_INTERVAL_HOURS
+        if relative_error >= CRAWL_ERROR_THRESHOLD:
+            interval = CRAWL_MIN_INTERVAL_HOURS
+        interval = min(max(interval, CRAWL_MIN_INTERVAL_HOURS), CRAWL_MAX_INTERVAL_HOURS)
+
+        next_due_at = row["last_seen"] + timedelta(hours=interval)
+        priority = volatility + relative_error / CRAWL_ERROR_THRESHOLD
+        plan[product_id] = (next_due_at, priority, volatility, interval)
+    return plan
+
+
+def refresh_crawl_schedule(collection=None, now=None):
+    """
+    Recalcula `next_due_at` y `crawl_priority` de los productos de la colección de entrada
+    a partir del historial de precios y del error reciente del modelo.
+    Devuelve un diccionario con los productos planificados y los que vencen ahora.
+    """
+    collection = collection if collection is not None else get_input_collection()
+    now = now or datetime.now()
+    started_at = time.monotonic()
+    stats = {"products": 0, "due": 0, "new": 0, "elapsed": 0.0}
+
+    try:
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(QUERY_PRICE_HISTORY, (now - timedelta(days=CRAWL_HISTORY_DAYS),))
+            history = cursor.fetchall()
+            cursor.execute(QUERY_RECENT_ERRORS, ((now - timedelta(days=7)).date(),))
+            errors = {int(row["product_id"]): float(row["mae"]) for row in cursor.fetchall()}
+
+        plan = crawl_plan(history, errors, now)
+
+        updates = []
+        for doc in collection.find({}, {"idProduct": 1}):
+            try:
+                product_id = int(doc.get("idProduct"))
+            except (TypeError, ValueError):
+                continue
+
+            if product_id in plan:
+                next_due_at, priority, volatility, interval = plan[product_id]
+            else:
+                next_due_at, priority, volatility, interval = now, NEW_PRODUCT_PRIORITY, None, None
+                stats["new"] += 1
+
+            stats["products"] += 1
+            stats["due"] += next_due_at <= now
+            updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+                "next_due_at": next_due_at,
+                "crawl_priority": priority,
+                "price_volatility": volatility,
+                "crawl_interval_hours": interval,
+            }}))
+
+            if len(updates) >= 1000:
+                collection.bulk_write(updates, ordered=False)
+                updates = []
+
+        if updates:
+            collection.bulk_write(updates, ordered=False)
+        collection.create_index([("next_due_at", ASCENDING), ("crawl_priority", DESCENDING)])
+
+    except Exception as e:
+        stats["error"] = str(e)
+        print(f"Error actualizando el plan de descargas: {e}")
+        return stats
+
+    stats["elapsed"] = time.monotonic() - started_at
+    print(
+        f"Plan de descargas actualizado: {stats['products']} productos, {stats['due']} vencidos "
+        f"({stats['new']} sin historial) en {stats['elapsed']:.2f} s."
+    )
+    return stats
+
+
+def due_documents(collection=None, now=None, limit=CRAWL_MAX_PER_RUN):
+    """
+    Cursor de los productos vencidos, de mayor a menor prioridad.
+    Los productos que nunca se planificaron también se incluyen.
+    """
+    collection = collection if collection is not None else get_input_collection()
+    now = now or datetime.now()
+
+    cursor = collection.find({
+        "$or": [{"next_due_at": {"$lte": now}}, {"next_due_at": {"$exists": False}}]
+    }).sort([("crawl_priority", DESCENDING)])
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
@@ -1,7 +1,12 @@
-from pymongo import MongoClient
+import logging
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import pymysql
+from utils import metrics
 
 # Cargar variables de entorno
 load_dotenv()
@@ -11,43 +16,253 @@ MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
 MONGO_INPUT_COLLECTION = os.getenv("MONGO_INPUT_COLLECTION", "products")
 MONGO_OUTPUT_COLLECTION = os.getenv("MONGO_OUTPUT_COLLECTION", "scraping-data")
-
-# Conexión a MongoDB
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DB_NAME]
-
-# Colecciones
-input_collection = db[MONGO_INPUT_COLLECTION]
-output_collection = db[MONGO_OUTPUT_COLLECTION]
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
 
 # Configuración de MySQL
 MYSQL_HOST = os.getenv("MYSQL_HOST")
+MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
 MYSQL_USER = os.getenv("MYSQL_USER")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE")
+# Conexiones abiertas como máximo, segundos de espera por una conexión libre
+# y antigüedad en segundos a partir de la cual una conexión se reemplaza
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "4"))
+MYSQL_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "30"))
+MYSQL_POOL_RECYCLE = float(os.getenv("MYSQL_POOL_RECYCLE", "3600"))
+MYSQL_CONNECT_TIMEOUT = int(os.getenv("MYSQL_CONNECT_TIMEOUT", "10"))
+
+logger = logging.getLogger(__name__)
+
+db_query_seconds = metrics.histogram("db_query_seconds", "Duración de cada consulta a MySQL por verbo")
+db_rows = metrics.counter("db_rows_affected_total", "Filas afectadas o devueltas por MySQL por verbo")
+mongo_command_seconds = metrics.histogram("mongo_command_seconds", "Duración de cada comando de MongoDB")
+mongo_command_failures = metrics.counter("mongo_command_failures_total", "Comandos de MongoDB fallidos")
+
+
+def query_verb(query):
+  words = query.split(None, 1)
+  return words[0].upper() if words else ""
+
+
+class InstrumentedCursor(pymysql.cursors.DictCursor):
+  """
+  Cursor que mide cada viaje a MySQL y cuenta las filas afectadas.
+  `executemany` arma sentencias multi-fila y envía cada una con `execute`,
+  así que también queda medido. Solo se usa con las métricas habilitadas.
+  """
+
+  def execute(self, query, args=None):
+    with db_query_seconds.time(verb=query_verb(query)):
+      result = super().execute(query, args)
+    db_rows.inc(max(self.rowcount, 0), verb=query_verb(query))
+    return result
+
+
+def mongo_command_listener():
+  """
+  Listener de pymongo que mide cada comando; pymongo se importa solo al crear el cliente.
+  """
+  from pymongo import monitoring
+
+  class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+      pass
+
+    def succeeded(self, event):
+      mongo_command_seconds.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+      mongo_command_seconds.observe(event.duration_micros / 1e6, command=event.command_name)
+      mongo_command_failures.inc(command=event.command_name)
+
+  return MongoCommandListener()
+
 
-# Conexión a MySQL
 config = {
   'user': MYSQL_USER,
   'password': MYSQL_PASSWORD,
   'host': MYSQL_HOST,  # O usa '127.0.0.1'
-  'port': 3306,
+  'port': MYSQL_PORT,
   'database': MYSQL_DATABASE,
-  'cursorclass': pymysql.cursors.DictCursor
+  'connect_timeout': MYSQL_CONNECT_TIMEOUT,
+  'cursorclass': InstrumentedCursor if metrics.ENABLED else pymysql.cursors.DictCursor
 }
 
-try:
-  # Crear conexión
-  connection = pymysql.connect(**config)
-  print("Conexión exitosa a la base de datos")
+_mongo_client = None
+_mysql_pool = None
+_lock = threading.Lock()
+
+
+def get_mongo_client():
+  """
+  Devuelve el cliente de MongoDB compartido, creado en el primer uso.
+  El cliente mantiene su propio pool de conexiones y es seguro entre hilos.
+  """
+  global _mongo_client
+  if _mongo_client is None:
+    with _lock:
+      if _mongo_client is None:
+        from pymongo import MongoClient
+        client_class, uri, options = MongoClient, MONGO_URI, {}
+        if uri and uri.startswith("mongomock://"):
+          # Servidor en memoria para pruebas locales (dependencia opcional)
+          import mongomock
+          client_class, uri = mongomock.MongoClient, "mongodb://" + uri[len("mongomock://"):]
+        elif metrics.ENABLED:
+          options["event_listeners"] = [mongo_command_listener()]
+        _mongo_client = client_class(
+          uri,
+          maxPoolSize=MONGO_MAX_POOL_SIZE,
+          minPoolSize=MONGO_MIN_POOL_SIZE,
+          serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+          connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+          connect=False,
+          **options
+        )
+  return _mongo_client
+
+
+def get_input_collection():
+  return get_mongo_client()[MONGO_DB_NAME][MONGO_INPUT_COLLECTION]
+
+
+def get_output_collection():
+  return get_mongo_client()[MONGO_DB_NAME][MONGO_OUTPUT_COLLECTION]
+
+
+class MySQLPool:
+  """
+  Pool de conexiones de MySQL seguro entre hilos.
+  Las conexiones se abren bajo demanda hasta `size`; al entregarlas se comprueba que
+  sigan vivas (ping con reconexión) y se reemplazan las que superan `recycle` segundos.
+  Al devolverlas se descarta cualquier transacción sin confirmar.
+  """
+
+  def __init__(self, size=MYSQL_POOL_SIZE, timeout=MYSQL_POOL_TIMEOUT, recycle=MYSQL_POOL_RECYCLE, **connect_args):
+    self.size = max(1, int(size))
+    self.timeout = timeout
+    self.recycle = recycle
+    self.connect_args = connect_args or config
+    self.idle = queue.LifoQueue()
+    self.opened = 0
+    self.created_at = {}
+    self.lock = threading.Lock()
+
+  def connect(self):
+    with self.lock:
+      if self.opened >= self.size:
+        return None
+      self.opened += 1
+
+    try:
+      connection = pymysql.connect(**self.connect_args)
+    except Exception:
+      with self.lock:
+        self.opened -= 1
+      raise
+
+    self.created_at[id(connection)] = time.monotonic()
+    return connection
+
+  def acquire(self):
+    """
+    Entrega una conexión libre, abre una nueva si no se alcanzó `size`
+    o espera hasta `timeout` segundos a que otro trabajo devuelva la suya.
+    """
+    deadline = time.monotonic() + self.timeout
+
+    while True:
+      try:
+        connection = self.idle.get_nowait()
+      except queue.Empty:
+        connection = self.connect()
+        if connection is not None:
+          return connection
+        try:
+          connection = self.idle.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+          raise TimeoutError(f"No hay conexiones de MySQL libres después de {self.timeout:.0f} s") from None
+
+      if time.monotonic() - self.created_at.get(id(connection), 0.0) > self.recycle:
+        self.discard(connection)
+        continue
+
+      try:
+        connection.ping(reconnect=True)
+      except pymysql.MySQLError as err:
+        logger.warning("Conexión de MySQL descartada: %s", err)
+        self.discard(connection)
+        continue
+
+      return connection
+
+  def release(self, connection):
+    try:
+      connection.rollback()
+    except Exception:
+      self.discard(connection)
+      return
+    self.idle.put(connection)
+
+  def discard(self, connection):
+    self.created_at.pop(id(connection), None)
+    try:
+      connection.close()
+    except Exception:
+      pass
+    with self.lock:
+      self.opened -= 1
+
+  def close(self):
+    while True:
+      try:
+        self.discard(self.idle.get_nowait())
+      except queue.Empty:
+        break
+
+
+def get_mysql_pool():
+  """
+  Devuelve el pool de MySQL compartido, creado en el primer uso.
+  """
+  global _mysql_pool
+  if _mysql_pool is None:
+    with _lock:
+      if _mysql_pool is None:
+        _mysql_pool = MySQLPool()
+  return _mysql_pool
+
+
+@contextmanager
+def mysql_connection():
+  """
+  Toma una conexión del pool para un trabajo y la devuelve al terminar:
+
+    with mysql_connection() as connection:
+      cursor = connection.cursor()
+      ...
+      connection.commit()
 
-  # Crear un cursor para ejecutar queries
-  cursor = connection.cursor()
+  Lo que no se confirme con `commit()` se revierte al devolverla.
+  """
+  pool = get_mysql_pool()
+  connection = pool.acquire()
+  try:
+    yield connection
+  finally:
+    pool.release(connection)
 
-except pymysql.MySQLError as err:
-  print(f"Error: {err}")
 
-# Función para cerrar la conexión MySQL
-def close_mysql_connection():
-  cursor.close()
-  connection.close()
+# Función para cerrar las conexiones abiertas
+def close_connections():
+  global _mongo_client, _mysql_pool
+  with _lock:
+    if _mysql_pool is not None:
+      _mysql_pool.close()
+      _mysql_pool = None
+    if _mongo_client is not None:
+      _mongo_client.close()
+      _mongo_client = None
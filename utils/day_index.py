@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from utils.database import get_output_collection
+
+
+class DayIndex:
+    """
+    Conjunto en memoria de los product_id ya capturados en el día actual.
+    Se carga con una única consulta proyectada al inicio de cada ejecución y se
+    recarga automáticamente si la ejecución cruza la medianoche.
+    """
+
+    def __init__(self, collection=None):
+        self.collection = collection if collection is not None else get_output_collection()
+        self.day = None
+        self.product_ids = set()
+
+    def load(self):
+        start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end_of_day = start_of_day + timedelta(days=1)
+
+        cursor = self.collection.find(
+            {
+                "timestamp": {
+                    "$gte": start_of_day.strftime('%Y-%m-%d %H:%M:%S'),
+                    "$lt": end_of_day.strftime('%Y-%m-%d %H:%M:%S')
+                }
+            },
+            {"product_id": 1, "_id": 0}
+        )
+
+        self.product_ids = {doc["product_id"] for doc in cursor if "product_id" in doc}
+        self.day = start_of_day.date()
+        print(f"{len(self.product_ids)} productos ya capturados el {self.day}.")
+        return self
+
+    def refresh_if_stale(self):
+        if self.day != datetime.now().date():
+            self.load()
+
+    def __contains__(self, product_id):
+        self.refresh_if_stale()
+        return product_id in self.product_ids
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def add(self, product_id):
+        self.product_ids.add(product_id)
+
+    def discard(self, product_id):
+        self.product_ids.discard(product_id)
@@ -0,0 +1,225 @@
+import os
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+
+try:
+    import lxml.html
+except ImportError:  # lxml es opcional
+    lxml = None
+
+# Cargar variables de entorno
+load_dotenv()
+
+SCRAPING_EXTRACTOR = os.getenv("SCRAPING_EXTRACTOR", "targeted")
+
+
+def clean_price(text):
+    """
+    Elimina el signo de $ y el prefijo 'US' del precio.
+    """
+    return text.replace('US', '').replace('$', '').strip()
+
+
+class SoupExtractor:
+    """
+    Extractor original: construye el árbol completo con BeautifulSoup y html.parser.
+    """
+    name = "soup"
+
+    def extract(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Obtener el título
+        title = soup.find('span', {'id': 'productTitle'}).text.strip()
+
+        # Obtener la calificación de estrellas y truncar a los primeros 3 caracteres
+        rating = soup.find('span', {'id': 'acrPopover'})['title'][:3]
+
+        # Obtener el precio y eliminar el signo de $ y el prefijo 'US'
+        price = clean_price(soup.find("span", {"class": "a-price"}).find("span").text)
+
+        return {"title": title, "rating": rating, "price": price}
+
+
+class LxmlExtractor:
+    """
+    Extractor basado en lxml: el árbol se construye en C y las búsquedas usan XPath.
+    Requiere el paquete opcional `lxml`.
+    """
+    name = "lxml"
+
+    def __init__(self):
+        if lxml is None:
+            raise ImportError("El extractor 'lxml' requiere instalar el paquete lxml")
+
+    def extract(self, html):
+        doc = lxml.html.fromstring(html)
+
+        title = doc.xpath('//span[@id="productTitle"]')[0].text_content().strip()
+        rating = doc.xpath('//span[@id="acrPopover"]')[0].attrib['title'][:3]
+        price_container = doc.xpath('//span[contains(concat(" ", normalize-space(@class), " "), " a-price ")]')[0]
+        price = clean_price(price_container.xpath('.//span')[0].text_content())
+
+        return {"title": title, "rating": rating, "price": price}
+
+
+class _FieldsFound(Exception):
+    pass
+
+
+class _TargetedParser(HTMLParser):
+    """
+    Recorre el HTML como flujo de eventos y solo acumula el texto de los tres
+    elementos buscados. Lanza `_FieldsFound` en cuanto los tiene para no seguir leyendo.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title_parts = None
+        self.title_depth = 0
+        self.title_done = False
+        self.rating = None
+        self.rating_seen = False
+        self.container_depth = 0
+        self.container_seen = False
+        self.price_parts = None
+        self.price_depth = 0
+        self.price_done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'span':
+            return
+
+        # Los spans anidados aumentan la profundidad de las capturas abiertas
+        if self.title_depth:
+            self.title_depth += 1
+        if self.price_depth:
+            self.price_depth += 1
+        if self.container_depth:
+            self.container_depth += 1
+
+        attributes = dict(attrs)
+        element_id = attributes.get('id')
+
+        if not self.title_done and self.title_parts is None and element_id == 'productTitle':
+            self.title_parts = []
+            self.title_depth = 1
+
+        if not self.rating_seen and element_id == 'acrPopover':
+            self.rating_seen = True
+            title = attributes.get('title')
+            if title is not None:
+                self.rating = title[:3]
+
+        if not self.price_done:
+            if self.container_depth > 1 and self.price_parts is None:
+                # Primer span descendiente del contenedor del precio
+                self.price_parts = []
+                self.price_depth = 1
+            elif not self.container_seen and 'a-price' in (attributes.get('class') or '').split():
+                self.container_seen = True
+                self.container_depth = 1
+
+    def handle_startendtag(self, tag, attrs):
+        # Un <span/> vacío se abre y se cierra en el mismo evento
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag != 'span':
+            return
+
+        if self.title_depth:
+            self.title_depth -= 1
+            if not self.title_depth:
+                self.title_done = True
+        if self.price_depth:
+            self.price_depth -= 1
+            if not self.price_depth:
+                self.price_done = True
+        if self.container_depth:
+            self.container_depth -= 1
+
+        if self.title_done and self.rating_seen and self.price_done:
+            raise _FieldsFound()
+
+    def handle_data(self, data):
+        if self.title_depth:
+            self.title_parts.append(data)
+        if self.price_depth:
+            self.price_parts.append(data)
+
+
+class TargetedExtractor:
+    """
+    Extractor dirigido: no construye ningún árbol y deja de leer la página
+    en cuanto encuentra título, calificación y precio.
+    """
+    name = "targeted"
+
+    chunk_size = 16384
+
+    def extract(self, html):
+        parser = _TargetedParser()
+
+        try:
+            for start in range(0, len(html), self.chunk_size):
+                parser.feed(html[start:start + self.chunk_size])
+            parser.close()
+        except _FieldsFound:
+            pass
+
+        if parser.title_parts is None or parser.rating is None or parser.price_parts is None:
+            raise ValueError("No se encontraron todos los campos del producto")
+
+        return {
+            "title": ''.join(parser.title_parts).strip(),
+            "rating": parser.rating,
+            "price": clean_price(''.join(parser.price_parts)),
+        }
+
+
+class FallbackExtractor:
+    """
+    Usa el extractor principal y recurre al secundario si el principal falla.
+    """
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    def extract(self, html):
+        try:
+            return self.primary.extract(html)
+        except Exception:
+            return self.fallback.extract(html)
+
+
+EXTRACTORS = {
+    "soup": SoupExtractor,
+    "lxml": LxmlExtractor,
+    "targeted": TargetedExtractor,
+}
+
+
+def get_extractor(name=None, fallback=True):
+    """
+    Devuelve el extractor configurado en SCRAPING_EXTRACTOR.
+    Salvo para "soup", el extractor BeautifulSoup queda como respaldo.
+    """
+    name = name or SCRAPING_EXTRACTOR
+
+    if name not in EXTRACTORS:
+        raise ValueError(f"Extractor desconocido: {name}")
+
+    try:
+        extractor = EXTRACTORS[name]()
+    except ImportError as e:
+        print(f"{e}. Se usa el extractor 'soup'.")
+        return SoupExtractor()
+
+    if fallback and name != "soup":
+        return FallbackExtractor(extractor, SoupExtractor())
+    return extractor
@@ -0,0 +1,243 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "http_cache")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+
+class ResponseCache:
+    """
+    Caché en disco de las páginas descargadas.
+    Los cuerpos se guardan comprimidos con gzip y direccionados por su hash SHA-256,
+    así que las URL con el mismo contenido comparten el archivo. Por URL se guardan el
+    ETag y Last-Modified para revalidar con solicitudes condicionales y los campos ya
+    extraídos del cuerpo actual, que se reutilizan mientras el hash no cambie.
+    Los cuerpos usados hace más tiempo se descartan al superar `max_bytes`.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self.urls = {}
+        self.bodies = {}
+        self.lock = threading.Lock()
+        self.stats = {"not_modified": 0, "unchanged": 0, "changed": 0, "new": 0, "parsed": 0, "parse_skipped": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            self.urls = index.get("urls", {})
+            self.bodies = index.get("bodies", {})
+
+    def body_path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.gz")
+
+    def conditional_headers(self, url):
+        """
+        Encabezados If-None-Match / If-Modified-Since de la versión guardada de `url`.
+        """
+        with self.lock:
+            entry = self.urls.get(url)
+            if entry is None or entry["sha"] not in self.bodies:
+                return {}
+
+            headers = {}
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            return headers
+
+    def not_modified(self, url):
+        """
+        Registra una respuesta 304 y devuelve la entrada guardada de `url`.
+        """
+        with self.lock:
+            entry = self.urls[url]
+            if not os.path.exists(self.body_path(entry["sha"])):
+                # Cuerpo borrado fuera de la caché: la próxima solicitud no será condicional
+                self.bodies.pop(entry["sha"], None)
+                del self.urls[url]
+                raise FileNotFoundError(f"La caché no tiene el cuerpo de {url}")
+            self.bodies[entry["sha"]]["last_used"] = time.time()
+            self.stats["not_modified"] += 1
+            return dict(entry)
+
+    def store(self, url, body, encoding=None, etag=None, last_modified=None):
+        """
+        Guarda el cuerpo de una respuesta 200 y devuelve la entrada de `url`.
+        Si el hash coincide con el guardado se conservan los campos ya extraídos.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.body_path(digest)
+
+        with self.lock:
+            known = digest in self.bodies
+
+        if not known:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+        with self.lock:
+            if digest not in self.bodies:
+                self.bodies[digest] = {"size": os.path.getsize(path), "raw_size": len(body)}
+            self.bodies[digest]["last_used"] = time.time()
+
+            previous = self.urls.get(url)
+            if previous is None:
+                self.stats["new"] += 1
+            elif previous["sha"] == digest:
+                self.stats["unchanged"] += 1
+            else:
+                self.stats["changed"] += 1
+
+            entry = {
+                "sha": digest,
+                "encoding": encoding,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.time(),
+            }
+            if previous is not None and previous["sha"] == digest:
+                entry["fields"] = previous.get("fields")
+                entry["extractor"] = previous.get("extractor")
+            self.urls[url] = entry
+            return dict(entry)
+
+    def read_text(self, entry):
+        with gzip.open(self.body_path(entry["sha"]), "rb") as f:
+            body = f.read()
+        return body.decode(entry.get("encoding") or "utf-8", errors="replace")
+
+    def cached_fields(self, entry, extractor_name):
+        """
+        Campos extraídos del mismo cuerpo con el mismo extractor, o None si hay que analizarlo.
+        """
+        if entry.get("fields") is not None and entry.get("extractor") == extractor_name:
+            with self.lock:
+                self.stats["parse_skipped"] += 1
+            return dict(entry["fields"])
+        return None
+
+    def remember_fields(self, url, entry, fields, extractor_name):
+        with self.lock:
+            self.stats["parsed"] += 1
+            current = self.urls.get(url)
+            if current is not None and current["sha"] == entry["sha"]:
+                current["fields"] = dict(fields)
+                current["extractor"] = extractor_name
+
+    def evict(self):
+        """
+        Descarta los cuerpos usados hace más tiempo hasta cumplir `max_bytes`
+        y las URL que apuntaban a ellos.
+        """
+        total_bytes = sum(body["size"] for body in self.bodies.values())
+        evicted = set()
+
+        for digest, body in sorted(self.bodies.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self.body_path(digest))
+            except FileNotFoundError:
+                pass
+            total_bytes -= body["size"]
+            evicted.add(digest)
+
+        for digest in evicted:
+            del self.bodies[digest]
+        self.urls = {url: entry for url, entry in self.urls.items() if entry["sha"] not in evicted}
+        return len(evicted)
+
+    def save(self):
+        """
+        Descarta los cuerpos sobrantes y guarda el índice de forma atómica.
+        """
+        with self.lock:
+            evicted = self.evict()
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"urls": self.urls, "bodies": self.bodies}, f)
+            os.replace(tmp_path, self.index_path)
+        return evicted
+
+    def summary(self):
+        stats = self.stats
+        return (
+            f"Caché HTTP: {stats['not_modified']} respuestas 304, {stats['unchanged']} sin cambios, "
+            f"{stats['changed']} modificadas, {stats['new']} nuevas; "
+            f"{stats['parse_skipped']} páginas sin volver a analizar, {stats['parsed']} analizadas."
+        )
+
+    def pages(self):
+        """
+        Recorre (url, html) de las páginas guardadas, sin acceder a la red.
+        """
+        for url, entry in list(self.urls.items()):
+            if entry["sha"] in self.bodies:
+                yield url, self.read_text(entry)
+
+
+def replay(cache, extractor):
+    """
+    Vuelve a ejecutar la extracción sobre las páginas guardadas en la caché.
+    Devuelve un diccionario con las páginas procesadas, las fallidas y la velocidad.
+    """
+    stats = {"pages": 0, "failed": 0, "elapsed": 0.0}
+    parse_seconds = 0.0
+
+    for url, html in cache.pages():
+        stats["pages"] += 1
+        started_at = time.perf_counter()
+        try:
+            extractor.extract(html)
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"La extracción falló para {url}: {e}")
+        parse_seconds += time.perf_counter() - started_at
+
+    stats["elapsed"] = parse_seconds
+    stats["pages_per_second"] = stats["pages"] / parse_seconds if parse_seconds > 0 else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    from utils.extractors import get_extractor
+
+    parser = argparse.ArgumentParser(description="Caché de respuestas HTTP del scraper")
+    parser.add_argument("command", choices=["replay", "stats"])
+    parser.add_argument("--extractor", default=None, help="Extractor a usar en la repetición")
+    parser.add_argument("--directory", default=HTTP_CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.directory)
+    if args.command == "stats":
+        stored = sum(body["size"] for body in cache.bodies.values())
+        raw = sum(body.get("raw_size", 0) for body in cache.bodies.values())
+        print(f"{len(cache.urls)} URL, {len(cache.bodies)} cuerpos, {stored / 1024 ** 2:.1f} MiB comprimidos ({raw / 1024 ** 2:.1f} MiB sin comprimir).")
+        sys.exit(0)
+
+    extractor = get_extractor(args.extractor, fallback=False)
+    stats = replay(cache, extractor)
+    print(
+        f"Repetición con '{extractor.name}': {stats['pages']} páginas en {stats['elapsed']:.2f} s "
+        f"({stats['pages_per_second']:.1f} páginas/s), {stats['failed']} fallidas."
+    )
+    sys.exit(1 if stats["failed"] else 0)
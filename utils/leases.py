@@ -0,0 +1,240 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING
+from utils.crawl_scheduler import CRAWL_ADAPTIVE, CRAWL_MIN_INTERVAL_HOURS
+from utils.database import get_input_collection
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Con SCRAPING_DISTRIBUTED=1 varios programadores comparten la colección de entrada
+SCRAPING_DISTRIBUTED = os.getenv("SCRAPING_DISTRIBUTED", "0") == "1"
+SCRAPING_WORKER_ID = os.getenv("SCRAPING_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# Productos reservados por cada reclamo y duración de la reserva
+SCRAPING_LEASE_BATCH = int(os.getenv("SCRAPING_LEASE_BATCH", "20"))
+SCRAPING_LEASE_SECONDS = int(os.getenv("SCRAPING_LEASE_SECONDS", "600"))
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseQueue:
+    """
+    Reparte los productos de la colección de entrada entre varios trabajadores.
+    Cada lote se reserva con un `update_many` que guarda el dueño, el vencimiento de la
+    reserva y un token del reclamo; otro trabajador solo puede tomarlo cuando la reserva
+    vence, así que el trabajo de un proceso caído se retoma solo. Mientras se recorren los
+    documentos, un hilo extiende las reservas en proceso para que un producto lento no quede
+    libre antes de terminar. Al terminar, el producto se marca como descargado y deja de
+    estar disponible hasta su próxima descarga.
+    """
+
+    def __init__(self, collection=None, worker_id=SCRAPING_WORKER_ID, batch_size=SCRAPING_LEASE_BATCH,
+                 lease_seconds=SCRAPING_LEASE_SECONDS, adaptive=CRAWL_ADAPTIVE):
+        self.collection = collection if collection is not None else get_input_collection()
+        self.worker_id = worker_id
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.adaptive = adaptive
+        self.outstanding = set()
+        self.held = {}
+        self.failed = set()
+        self.completed = []
+        self.lease_renewed_at = None
+        self.lock = threading.Lock()
+        self.heartbeat = None
+        self.stopped = threading.Event()
+        self.stats = {"claimed": 0, "completed": 0, "released": 0}
+        # Índice de los productos pendientes y libres para no recorrer los ya descargados en cada reclamo
+        pending_field = "next_due_at" if adaptive else "last_crawled_at"
+        self.collection.create_index([(pending_field, ASCENDING), ("lease_expires_at", ASCENDING)])
+
+    def available_filter(self, now):
+        """
+        Productos pendientes de descarga cuya reserva no existe o ya venció.
+        """
+        if self.adaptive:
+            pending = {"$or": [{"next_due_at": {"$lte": now}}, {"next_due_at": {"$exists": False}}]}
+        else:
+            start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            pending = {"$or": [{"last_crawled_at": {"$lt": start_of_day}}, {"last_crawled_at": None}]}
+
+        free = {"$or": [{"lease_expires_at": {"$lt": now}}, {"lease_expires_at": None}]}
+        conditions = [pending, free]
+        if self.failed:
+            # Los que fallaron en esta pasada se reintentan en la siguiente
+            conditions.append({"_id": {"$nin": list(self.failed)}})
+        return {"$and": conditions}
+
+    def claim_batch(self):
+        """
+        Reserva hasta `batch_size` productos, de mayor a menor prioridad, y los devuelve.
+        Los candidatos se marcan en un solo `update_many` que vuelve a comprobar que sigan
+        libres y se leen de nuevo por su token; los que otro trabajador tomó en el intervalo
+        se reemplazan por los siguientes. También extiende las reservas de los lotes
+        anteriores que siguen en proceso.
+        """
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        sort = [("crawl_priority", DESCENDING), ("_id", ASCENDING)] if self.adaptive else [("_id", ASCENDING)]
+
+        batch = []
+        while len(batch) < self.batch_size:
+            available = self.available_filter(now)
+            candidates = [
+                doc["_id"] for doc in
+                self.collection.find(available, {"_id": 1}, sort=sort, limit=self.batch_size - len(batch))
+            ]
+            if not candidates:
+                break
+
+            token = uuid.uuid4().hex
+            self.collection.update_many(
+                {"$and": [available, {"_id": {"$in": candidates}}]},
+                {"$set": {"lease_owner": self.worker_id, "lease_expires_at": expires_at, "lease_token": token}}
+            )
+            batch.extend(self.collection.find({"_id": {"$in": candidates}, "lease_token": token}, sort=sort))
+
+        with self.lock:
+            previous = list(self.outstanding)
+            self.outstanding.update(doc["_id"] for doc in batch)
+        if previous:
+            self.extend(previous, expires_at)
+
+        self.lease_renewed_at = now
+        self.stats["claimed"] += len(batch)
+        return batch
+
+    def extend(self, doc_ids, expires_at):
+        self.collection.update_many(
+            {"_id": {"$in": doc_ids}, "lease_owner": self.worker_id},
+            {"$set": {"lease_expires_at": expires_at}}
+        )
+
+    def renew(self):
+        """
+        Extiende las reservas de los productos aún en proceso si pasó la mitad de su duración.
+        """
+        now = datetime.now()
+        with self.lock:
+            outstanding = list(self.outstanding)
+        if not outstanding or now - self.lease_renewed_at < timedelta(seconds=self.lease_seconds / 2):
+            return
+        self.extend(outstanding, now + timedelta(seconds=self.lease_seconds))
+        self.lease_renewed_at = now
+
+    def start_heartbeat(self):
+        """
+        Renueva las reservas en un hilo cada cuarto de su duración hasta `close()`,
+        también mientras se procesa un lote lento.
+        """
+        if self.heartbeat is not None:
+            return
+        self.stopped.clear()
+
+        def beat():
+            while not self.stopped.wait(self.lease_seconds / 4):
+                try:
+                    self.renew()
+                except Exception as e:
+                    logger.warning("No se pudieron renovar las reservas de %s: %s", self.worker_id, e)
+
+        self.heartbeat = threading.Thread(target=beat, name=f"leases-{self.worker_id}", daemon=True)
+        self.heartbeat.start()
+
+    def stop_heartbeat(self):
+        if self.heartbeat is None:
+            return
+        self.stopped.set()
+        self.heartbeat.join()
+        self.heartbeat = None
+
+    def documents(self):
+        """
+        Recorre los productos reservando lotes a medida que se consumen.
+        """
+        self.start_heartbeat()
+        while True:
+            self.flush()
+            self.renew()
+            batch = self.claim_batch()
+            if not batch:
+                return
+            yield from batch
+
+    def hold(self, doc):
+        """
+        Deja pendiente un producto cuyo registro se entrega al sink: se completa con
+        `saved` cuando su lote se guarda, así un trabajador que se cae antes de vaciar
+        el lote no marca como descargados productos que no llegaron a guardarse.
+        """
+        self.held[doc["idProduct"]] = doc
+
+    def saved(self, record, success):
+        """
+        Resultado del sink para un registro; se usa como `on_saved` de RecordSink.
+        """
+        doc = self.held.get(record["product_id"])
+        if doc is not None:
+            self.complete(doc, success)
+
+    def complete(self, doc, success):
+        """
+        Registra el resultado de un producto reservado. Los exitosos se marcan como
+        descargados; los fallidos se liberan para que otra pasada los reintente.
+        """
+        self.held.pop(doc.get("idProduct"), None)
+        with self.lock:
+            self.outstanding.discard(doc["_id"])
+        if not success:
+            self.failed.add(doc["_id"])
+        self.completed.append((doc["_id"], success))
+        if len(self.completed) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.completed:
+            return
+
+        now = datetime.now()
+        release = {"lease_owner": None, "lease_expires_at": None}
+        succeeded = [doc_id for doc_id, success in self.completed if success]
+        failed = [doc_id for doc_id, success in self.completed if not success]
+
+        # Solo se modifican los productos cuya reserva sigue siendo de este trabajador
+        if succeeded:
+            changes = dict(release, last_crawled_at=now)
+            if self.adaptive:
+                # El plan de descargas fija el vencimiento definitivo en su próxima actualización
+                changes["next_due_at"] = now + timedelta(hours=CRAWL_MIN_INTERVAL_HOURS)
+            self.collection.update_many({"_id": {"$in": succeeded}, "lease_owner": self.worker_id}, {"$set": changes})
+        if failed:
+            self.collection.update_many({"_id": {"$in": failed}, "lease_owner": self.worker_id}, {"$set": release})
+
+        self.stats["completed"] += len(succeeded)
+        self.stats["released"] += len(failed)
+        self.completed = []
+
+    def close(self):
+        """
+        Guarda los resultados pendientes y libera las reservas que no se procesaron.
+        """
+        self.stop_heartbeat()
+        self.flush()
+        if self.outstanding:
+            self.collection.update_many(
+                {"_id": {"$in": list(self.outstanding)}, "lease_owner": self.worker_id},
+                {"$set": {"lease_owner": None, "lease_expires_at": None}}
+            )
+            self.stats["released"] += len(self.outstanding)
+            self.outstanding = set()
+
+    def summary(self):
+        return (
+            f"Trabajador {self.worker_id}: {self.stats['claimed']} productos reservados, "
+            f"{self.stats['completed']} completados, {self.stats['released']} liberados."
+        )
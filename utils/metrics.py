@@ -0,0 +1,261 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# "off": métricas deshabilitadas (sin costo), "file": se escriben en METRICS_FILE
+# al terminar cada trabajo, "http": además se sirven en http://0.0.0.0:METRICS_PORT/metrics
+METRICS_MODE = os.getenv("METRICS_MODE", "off")
+METRICS_FILE = os.getenv("METRICS_FILE", "metrics.prom")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")
+# Los mensajes repetidos por producto se registran una vez cada LOG_SAMPLE_EVERY apariciones
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "50"))
+
+ENABLED = METRICS_MODE != "off"
+
+# Límites de los histogramas de duración, en segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def samples(self):
+        result = []
+        with self.lock:
+            for key, (counts, total, count) in self.series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    result.append((f"{self.name}_bucket", key + (("le", repr(float(bound))),), cumulative))
+                result.append((f"{self.name}_bucket", key + (("le", "+Inf"),), count))
+                result.append((f"{self.name}_sum", key, total))
+                result.append((f"{self.name}_count", key, count))
+        return result
+
+
+class NoopMetric:
+    """
+    Métrica sin efecto para METRICS_MODE=off: cada llamada cuesta una llamada vacía.
+    """
+
+    def inc(self, value=1, **labels):
+        pass
+
+    def set(self, value, **labels):
+        pass
+
+    def observe(self, value, **labels):
+        pass
+
+    @contextmanager
+    def time(self, **labels):
+        yield
+
+
+NOOP = NoopMetric()
+_metrics = {}
+_registry_lock = threading.Lock()
+
+
+def register(metric_class, name, help_text, **kwargs):
+    if not ENABLED:
+        return NOOP
+    with _registry_lock:
+        if name not in _metrics:
+            _metrics[name] = metric_class(name, help_text, **kwargs)
+        return _metrics[name]
+
+
+def counter(name, help_text):
+    return register(Counter, name, help_text)
+
+
+def gauge(name, help_text):
+    return register(Gauge, name, help_text)
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    return register(Histogram, name, help_text, buckets=buckets)
+
+
+def export():
+    """
+    Devuelve todas las métricas en el formato de texto de Prometheus.
+    """
+    lines = []
+    with _registry_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric.samples():
+            lines.append(f"{name}{format_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path=None):
+    """
+    Escribe las métricas de forma atómica para el textfile collector de node_exporter.
+    """
+    if not ENABLED:
+        return
+    path = path or METRICS_FILE
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(export())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.getLogger(__name__).warning("No se pudieron escribir las métricas en %s: %s", path, e)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = export().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """
+    Sirve /metrics en un hilo en segundo plano si METRICS_MODE=http.
+    """
+    if METRICS_MODE != "http":
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.getLogger(__name__).info("Métricas disponibles en el puerto %s", port)
+    return server
+
+
+job_duration = histogram("job_duration_seconds", "Duración de cada trabajo programado")
+job_runs = counter("job_runs_total", "Ejecuciones de trabajos por resultado")
+
+
+def track_job(name, func):
+    """
+    Envuelve un trabajo para medir su duración y contar sus ejecuciones por resultado;
+    al terminar se exportan las métricas al archivo.
+    """
+    @wraps(func)
+    def tracked(*args, **kwargs):
+        status = "error"
+        try:
+            with job_duration.time(job=name):
+                result = func(*args, **kwargs)
+            if not (isinstance(result, dict) and result.get("error")):
+                status = "ok"
+            return result
+        finally:
+            job_runs.inc(job=name, status=status)
+            write_metrics_file()
+    return tracked
+
+
+def configure_logging(level=None):
+    logging.basicConfig(
+        level=(level or LOG_LEVEL).upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+
+_sample_counts = {}
+_sample_lock = threading.Lock()
+
+
+def sampled(key, every=None):
+    """
+    Devuelve (registrar, apariciones): True en la primera aparición de `key`
+    y luego una vez cada `every`, para no llenar el registro con mensajes por producto.
+    """
+    every = max(1, every or LOG_SAMPLE_EVERY)
+    with _sample_lock:
+        count = _sample_counts.get(key, 0) + 1
+        _sample_counts[key] = count
+    return count % every == 1 or every == 1, count
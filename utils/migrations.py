@@ -0,0 +1,355 @@
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from utils.database import mysql_connection, MYSQL_DATABASE
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tables.sql")
+
+# Forma final de `scraping-data` para crear bases nuevas (en tables.sql solo se modifica)
+SCRAPING_DATA_TABLE = """
+CREATE TABLE `scraping-data` (
+  _id VARCHAR(24) PRIMARY KEY,
+  product_id INT NOT NULL,
+  title TEXT,
+  rating DECIMAL(3, 1) NULL,
+  price DECIMAL(12, 2) NULL,
+  url TEXT,
+  timestamp DATETIME NOT NULL,
+  KEY idx_scraping_data_product_timestamp (product_id, timestamp),
+  KEY idx_scraping_data_timestamp (timestamp)
+)
+"""
+
+# Cada migración se aplica una sola vez y queda registrada en `schema_migrations`.
+# Las sentencias DDL de MySQL confirman la transacción implícitamente, por eso cada
+# paso comprueba el estado actual del esquema y puede repetirse sin efectos.
+
+
+def table_exists(cursor, table, schema=None):
+  cursor.execute("""
+  SELECT COUNT(*) AS total FROM information_schema.tables
+  WHERE table_schema = %s AND table_name = %s
+  """, (schema or MYSQL_DATABASE, table))
+  return cursor.fetchone()['total'] > 0
+
+
+def column_exists(cursor, table, column, schema=None):
+  cursor.execute("""
+  SELECT COUNT(*) AS total FROM information_schema.columns
+  WHERE table_schema = %s AND table_name = %s AND column_name = %s
+  """, (schema or MYSQL_DATABASE, table, column))
+  return cursor.fetchone()['total'] > 0
+
+
+def column_type(cursor, table, column, schema=None):
+  cursor.execute("""
+  SELECT data_type FROM information_schema.columns
+  WHERE table_schema = %s AND table_name = %s AND column_name = %s
+  """, (schema or MYSQL_DATABASE, table, column))
+  result = cursor.fetchone()
+  return result['data_type'].lower() if result else None
+
+
+def index_exists(cursor, table, index, schema=None):
+  cursor.execute("""
+  SELECT COUNT(*) AS total FROM information_schema.statistics
+  WHERE table_schema = %s AND table_name = %s AND index_name = %s
+  """, (schema or MYSQL_DATABASE, table, index))
+  return cursor.fetchone()['total'] > 0
+
+
+def add_index(cursor, table, index, definition, schema=None):
+  if not index_exists(cursor, table, index, schema):
+    qualified = f"`{schema}`.`{table}`" if schema else f"`{table}`"
+    cursor.execute(f"ALTER TABLE {qualified} ADD {definition}")
+
+
+def migration_001_predictions_keys(cursor):
+  """
+  Elimina predicciones duplicadas y agrega la clave única (product_id, timestamp)
+  y los índices de las consultas de conciliación, errores y ETL.
+  """
+  if not index_exists(cursor, "predictions", "uq_predictions_product_timestamp"):
+    cursor.execute("""
+    DELETE p1 FROM predictions p1
+    JOIN predictions p2
+      ON p1.product_id = p2.product_id AND p1.timestamp = p2.timestamp AND p1.id > p2.id
+    """)
+    cursor.connection.commit()
+    add_index(cursor, "predictions", "uq_predictions_product_timestamp",
+              "UNIQUE KEY uq_predictions_product_timestamp (product_id, timestamp)")
+
+  if not column_exists(cursor, "predictions", "error_applied"):
+    cursor.execute("ALTER TABLE predictions ADD COLUMN error_applied TINYINT NOT NULL DEFAULT 0")
+
+  add_index(cursor, "predictions", "idx_predictions_real_price", "KEY idx_predictions_real_price (real_price)")
+  add_index(cursor, "predictions", "idx_predictions_error_applied", "KEY idx_predictions_error_applied (error_applied)")
+  add_index(cursor, "predictions", "idx_predictions_timestamp", "KEY idx_predictions_timestamp (timestamp)")
+
+
+def migration_002_model_errors_keys(cursor):
+  """
+  Agrega la fecha de cálculo como columna generada y deja un registro por producto y día.
+  """
+  if not column_exists(cursor, "model_errors", "error_date"):
+    cursor.execute("ALTER TABLE model_errors ADD COLUMN error_date DATE AS (DATE(timestamp)) STORED")
+
+  if not index_exists(cursor, "model_errors", "uq_model_errors_product_date"):
+    # Conservar el registro más reciente de cada producto y día
+    cursor.execute("""
+    DELETE e1 FROM model_errors e1
+    JOIN model_errors e2
+      ON e1.product_id = e2.product_id AND e1.error_date = e2.error_date AND e1.id < e2.id
+    """)
+    cursor.connection.commit()
+    add_index(cursor, "model_errors", "uq_model_errors_product_date",
+              "UNIQUE KEY uq_model_errors_product_date (product_id, error_date)")
+
+  add_index(cursor, "model_errors", "idx_model_errors_error_date", "KEY idx_model_errors_error_date (error_date)")
+
+
+def migration_003_support_tables(cursor):
+  """
+  Crea las tablas del almacén de características y de los agregados de errores.
+  """
+  cursor.execute("""
+  CREATE TABLE IF NOT EXISTS error_aggregates (
+    product_id INT PRIMARY KEY,
+    n INT NOT NULL,
+    sum_abs_error DOUBLE NOT NULL,
+    sum_sq_error DOUBLE NOT NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+  )
+  """)
+  cursor.execute("""
+  CREATE TABLE IF NOT EXISTS product_features (
+    product_id INT NOT NULL,
+    timestamp DATETIME NOT NULL,
+    price FLOAT NOT NULL,
+    rating FLOAT NOT NULL,
+    day INT NOT NULL,
+    month INT NOT NULL,
+    day_of_week INT NOT NULL,
+    days_since_start INT NOT NULL,
+    moving_avg_3 FLOAT NOT NULL,
+    moving_avg_7 FLOAT NOT NULL,
+    PRIMARY KEY (product_id, timestamp)
+  )
+  """)
+  cursor.execute("""
+  CREATE TABLE IF NOT EXISTS feature_state (
+    name VARCHAR(64) PRIMARY KEY,
+    watermark DATETIME NOT NULL,
+    start_date DATETIME NOT NULL
+  )
+  """)
+
+
+def migration_004_scraping_data_types(cursor):
+  """
+  Convierte `scraping-data.timestamp`, `price` y `rating` a DATETIME y DECIMAL
+  y agrega los índices por producto y fecha.
+  """
+  if column_type(cursor, "scraping-data", "price") != "decimal":
+    # Quitar separadores de miles y anular valores que no son números
+    cursor.execute("UPDATE `scraping-data` SET price = REPLACE(price, ',', '') WHERE price LIKE '%,%'")
+    cursor.execute("""
+    UPDATE `scraping-data` SET price = NULL
+    WHERE price IS NOT NULL AND price NOT REGEXP '^[0-9]+(\\\\.[0-9]+)?$'
+    """)
+    cursor.execute("""
+    UPDATE `scraping-data` SET rating = NULL
+    WHERE rating IS NOT NULL AND rating NOT REGEXP '^[0-9](\\\\.[0-9])?$'
+    """)
+    cursor.connection.commit()
+
+  cursor.execute("""
+  ALTER TABLE `scraping-data`
+    MODIFY timestamp DATETIME NOT NULL,
+    MODIFY price DECIMAL(12, 2) NULL,
+    MODIFY rating DECIMAL(3, 1) NULL
+  """)
+
+  add_index(cursor, "scraping-data", "idx_scraping_data_product_timestamp",
+            "KEY idx_scraping_data_product_timestamp (product_id, timestamp)")
+  add_index(cursor, "scraping-data", "idx_scraping_data_timestamp", "KEY idx_scraping_data_timestamp (timestamp)")
+
+
+def migration_005_reporting_tables(cursor):
+  """
+  Deja `fact_predictions` con una fila por producto y fecha y crea la tabla de marcas de agua del ETL.
+  """
+  from data.updater import PBI_DATABASE
+
+  cursor.execute(f"""
+  CREATE TABLE IF NOT EXISTS `{PBI_DATABASE}`.etl_state (
+    name VARCHAR(64) PRIMARY KEY,
+    watermark DATETIME NOT NULL
+  )
+  """)
+
+  if not table_exists(cursor, "fact_predictions", PBI_DATABASE):
+    return
+
+  if not index_exists(cursor, "fact_predictions", "uq_fact_predictions_product_date", PBI_DATABASE):
+    # Reconstruir la tabla sin duplicados: INSERT IGNORE conserva una fila por clave
+    cursor.execute(f"DROP TABLE IF EXISTS `{PBI_DATABASE}`.fact_predictions_new")
+    cursor.execute(f"CREATE TABLE `{PBI_DATABASE}`.fact_predictions_new LIKE `{PBI_DATABASE}`.fact_predictions")
+    cursor.execute(f"""
+    ALTER TABLE `{PBI_DATABASE}`.fact_predictions_new
+    ADD UNIQUE KEY uq_fact_predictions_product_date (product_id, scraped_date)
+    """)
+    cursor.execute(f"INSERT IGNORE INTO `{PBI_DATABASE}`.fact_predictions_new SELECT * FROM `{PBI_DATABASE}`.fact_predictions")
+    cursor.connection.commit()
+    cursor.execute(f"""
+    RENAME TABLE `{PBI_DATABASE}`.fact_predictions TO `{PBI_DATABASE}`.fact_predictions_old,
+      `{PBI_DATABASE}`.fact_predictions_new TO `{PBI_DATABASE}`.fact_predictions
+    """)
+    cursor.execute(f"DROP TABLE `{PBI_DATABASE}`.fact_predictions_old")
+
+
+MIGRATIONS = [
+  (1, "Claves e índices de predictions", migration_001_predictions_keys),
+  (2, "Claves e índices de model_errors", migration_002_model_errors_keys),
+  (3, "Tablas de características y agregados de errores", migration_003_support_tables),
+  (4, "Tipos nativos e índices de scraping-data", migration_004_scraping_data_types),
+  (5, "Clave única de fact_predictions y estado del ETL", migration_005_reporting_tables),
+]
+
+
+def applied_versions(cursor):
+  cursor.execute("""
+  CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL
+  )
+  """)
+  cursor.execute("SELECT version FROM schema_migrations")
+  return {row['version'] for row in cursor.fetchall()}
+
+
+def migrate():
+  """
+  Aplica en orden las migraciones pendientes y devuelve las versiones aplicadas.
+  """
+  applied = []
+
+  with mysql_connection() as connection:
+    cursor = connection.cursor()
+    done = applied_versions(cursor)
+
+    for version, description, migration in MIGRATIONS:
+      if version in done:
+        continue
+
+      print(f"Aplicando migración {version}: {description}...")
+      try:
+        migration(cursor)
+        cursor.execute(
+          "INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)",
+          (version, description, datetime.now())
+        )
+        connection.commit()
+      except Exception as e:
+        connection.rollback()
+        print(f"Error aplicando la migración {version}: {e}")
+        break
+
+      applied.append(version)
+
+  if not applied:
+    print("El esquema ya está actualizado.")
+  return applied
+
+
+def read_schema():
+  """
+  Separa las sentencias de tables.sql entre la base principal y la de reportes para crear
+  bases nuevas. Los cambios sobre `scraping-data` se omiten: la tabla se crea ya con su forma final.
+  """
+  with open(SCHEMA_FILE, encoding="utf-8") as f:
+    main_sql, pbi_sql = f.read().split("-- Base de datos de reportes")
+  # Resto de la línea del comentario que separa ambas bases
+  pbi_sql = pbi_sql.split("\n", 1)[1]
+
+  def statements(sql):
+    sql = "\n".join(line for line in sql.splitlines() if not line.strip().startswith("--"))
+    return [s.strip() for s in sql.split(";") if s.strip() and "scraping-data" not in s]
+
+  return [SCRAPING_DATA_TABLE] + statements(main_sql), statements(pbi_sql)
+
+
+# (consulta, tabla o alias) cuyo recorrido completo es esperado:
+# `error_aggregates` tiene una fila por producto y se recorre para unirla con `model_errors`
+FULL_SCAN_ALLOWED = {
+  ("errores de productos con datos nuevos", "a"),
+}
+
+
+def hot_queries():
+  """
+  Consultas frecuentes del pipeline con parámetros de ejemplo para EXPLAIN.
+  """
+  from data.checker import (
+    QUERY_ADD_ERROR_AGGREGATES, QUERY_CLAIM_NEW_ERRORS, QUERY_FIX_NULL_WINDOW,
+    QUERY_PENDING_PREDICTIONS, QUERY_UPDATE_CHANGED_ERRORS, QUERY_UPDATE_REAL_PRICES_RANGE,
+    QUERY_UPDATE_TODAY_ERRORS
+  )
+  from data.updater import ETL_QUERY
+  from model.features import QUERY_NEW_SCRAPING_ROWS, QUERY_ROLLING_CONTEXT, ROLLING_CONTEXT_ROWS
+
+  # La marca de agua del almacén de características suele ser de la ejecución anterior
+  sample_date = datetime.now() - timedelta(days=1)
+  return [
+    ("predicciones pendientes", QUERY_PENDING_PREDICTIONS, None),
+    ("conciliación de precios reales", QUERY_UPDATE_REAL_PRICES_RANGE, (1, 10000)),
+    ("ventana de precios faltantes", QUERY_FIX_NULL_WINDOW, None),
+    ("predicciones conciliadas nuevas", QUERY_CLAIM_NEW_ERRORS, None),
+    ("agregados de errores", QUERY_ADD_ERROR_AGGREGATES, None),
+    ("errores de productos con datos nuevos", QUERY_UPDATE_CHANGED_ERRORS, None),
+    ("errores del día", QUERY_UPDATE_TODAY_ERRORS, None),
+    ("datos nuevos para características", QUERY_NEW_SCRAPING_ROWS, (sample_date,)),
+    ("contexto de promedios móviles", QUERY_ROLLING_CONTEXT.format(placeholders="%s, %s"), (1, 2, sample_date, ROLLING_CONTEXT_ROWS)),
+    ("ETL de fact_predictions", ETL_QUERY, (sample_date, sample_date)),
+  ]
+
+
+def check_query_plans():
+  """
+  Ejecuta EXPLAIN sobre las consultas frecuentes y devuelve las que recorrerían una tabla
+  completa (type = ALL), salvo las permitidas en FULL_SCAN_ALLOWED.
+  Las tablas derivadas (<derivedN>) se ignoran.
+  """
+  failures = []
+
+  # EXPLAIN de sentencias de escritura no modifica datos; la conexión se revierte al devolverla
+  with mysql_connection() as connection:
+    cursor = connection.cursor()
+    for name, query, params in hot_queries():
+      cursor.execute("EXPLAIN " + query.strip().rstrip(';'), params)
+      for row in cursor.fetchall():
+        table = row.get('table') or ''
+        if table.startswith('<'):
+          continue
+        if row.get('type') == 'ALL' and (name, table) not in FULL_SCAN_ALLOWED:
+          failures.append((name, table))
+
+  return failures
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Migraciones del esquema de MySQL")
+  parser.add_argument("command", choices=["migrate", "check-plans"])
+  args = parser.parse_args()
+
+  if args.command == "migrate":
+    migrate()
+  else:
+    failures = check_query_plans()
+    for name, table in failures:
+      print(f"Recorrido completo sin índice en `{table}` para la consulta: {name}")
+    if failures:
+      sys.exit(1)
+    print("Todas las consultas frecuentes usan índices.")
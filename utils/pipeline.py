@@ -0,0 +1,270 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Expresión cron (minuto hora día mes día_semana) que inicia el pipeline completo
+PIPELINE_CRON = os.getenv("PIPELINE_CRON", "0 3 * * *")
+PIPELINE_RETRIES = int(os.getenv("PIPELINE_RETRIES", "2"))
+PIPELINE_RETRY_DELAY = float(os.getenv("PIPELINE_RETRY_DELAY", "60"))
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+# Archivo JSON Lines donde se agrega la duración de cada etapa por ejecución
+PIPELINE_HISTORY_FILE = os.getenv("PIPELINE_HISTORY_FILE", "pipeline_runs.jsonl")
+
+
+class Stage:
+    """
+    Etapa del pipeline: una función sin argumentos y las etapas de las que depende.
+    La etapa falla si la función lanza una excepción o devuelve un diccionario con "error".
+    """
+
+    def __init__(self, name, func, depends_on=(), retries=None, retry_delay=None):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.retries = PIPELINE_RETRIES if retries is None else retries
+        self.retry_delay = PIPELINE_RETRY_DELAY if retry_delay is None else retry_delay
+
+    def run(self):
+        """
+        Ejecuta la etapa con reintentos y devuelve el registro de la ejecución.
+        """
+        record = {"stage": self.name, "status": "failed", "attempts": 0, "error": None}
+        record["started_at"] = time.time()
+
+        for attempt in range(1, self.retries + 2):
+            record["attempts"] = attempt
+            try:
+                result = self.func()
+                error = result.get("error") if isinstance(result, dict) else None
+            except Exception as e:
+                error = str(e)
+
+            if not error:
+                record["status"] = "succeeded"
+                record["error"] = None
+                break
+
+            record["error"] = error
+            print(f"La etapa {self.name} falló (intento {attempt} de {self.retries + 1}): {error}")
+            if attempt <= self.retries:
+                time.sleep(self.retry_delay)
+
+        record["finished_at"] = time.time()
+        record["duration"] = record["finished_at"] - record["started_at"]
+        return record
+
+
+class Pipeline:
+    """
+    Ejecuta un grafo acíclico de etapas: cada etapa empieza en cuanto terminan con éxito
+    todas sus dependencias y las etapas independientes corren en paralelo.
+    Si una etapa agota sus reintentos, las que dependen de ella se omiten.
+    """
+
+    def __init__(self, stages, max_workers=PIPELINE_MAX_WORKERS):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max(1, int(max_workers))
+        self.order = self.topological_order()
+
+    def topological_order(self):
+        order = []
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"El pipeline tiene un ciclo: {' -> '.join(path + [name])}")
+            if name not in self.stages:
+                raise ValueError(f"Dependencia desconocida: {name} (requerida por {path[-1]})")
+
+            state[name] = "visiting"
+            for dependency in self.stages[name].depends_on:
+                visit(dependency, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def run(self):
+        """
+        Ejecuta todas las etapas y devuelve {nombre: registro} con estado, intentos y duración.
+        """
+        records = {}
+        running = {}
+        pending = list(self.order)
+
+        print(f"Iniciando pipeline con {len(pending)} etapas...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    dependencies = self.stages[name].depends_on
+                    if any(records.get(d, {}).get("status") in ("failed", "skipped") for d in dependencies):
+                        records[name] = {"stage": name, "status": "skipped", "attempts": 0, "duration": 0.0, "error": None}
+                        pending.remove(name)
+                        print(f"Etapa {name} omitida: falló una de sus dependencias.")
+                    elif all(records.get(d, {}).get("status") == "succeeded" for d in dependencies):
+                        print(f"Iniciando etapa {name}...")
+                        running[executor.submit(self.stages[name].run)] = name
+                        pending.remove(name)
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    records[name] = future.result()
+                    print(f"Etapa {name}: {records[name]['status']} en {records[name]['duration']:.1f} s.")
+
+        return records
+
+    def critical_path(self, records):
+        """
+        Cadena de etapas que determinó la duración total: desde la última etapa en
+        terminar se retrocede por la dependencia que terminó más tarde.
+        """
+        finished = {name: record for name, record in records.items() if "finished_at" in record}
+        if not finished:
+            return []
+
+        name = max(finished, key=lambda stage: finished[stage]["finished_at"])
+        path = [name]
+        while True:
+            dependencies = [d for d in self.stages[name].depends_on if d in finished]
+            if not dependencies:
+                break
+            name = max(dependencies, key=lambda stage: finished[stage]["finished_at"])
+            path.append(name)
+        return path[::-1]
+
+    def report(self, records):
+        """
+        Imprime la duración de cada etapa y la ruta crítica y la agrega al historial.
+        """
+        path = self.critical_path(records)
+        started = [r["started_at"] for r in records.values() if "started_at" in r]
+        finished = [r["finished_at"] for r in records.values() if "finished_at" in r]
+        total = max(finished) - min(started) if started else 0.0
+
+        print(f"{'etapa':<12}{'estado':<11}{'intentos':>9}{'duración (s)':>14}")
+        for name in self.order:
+            record = records[name]
+            print(f"{name:<12}{record['status']:<11}{record['attempts']:>9}{record['duration']:>14.1f}")
+        print(
+            f"Ruta crítica: {' -> '.join(path) or '-'} "
+            f"({sum(records[name]['duration'] for name in path):.1f} s de {total:.1f} s totales)"
+        )
+
+        if PIPELINE_HISTORY_FILE:
+            entry = {
+                "started_at": datetime.fromtimestamp(min(started)).isoformat() if started else None,
+                "duration": total,
+                "critical_path": path,
+                "stages": [records[name] for name in self.order],
+            }
+            try:
+                with open(PIPELINE_HISTORY_FILE, "a", encoding="utf-8") as history:
+                    history.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                print(f"No se pudo guardar el historial del pipeline: {e}")
+
+        return path
+
+
+def parse_cron_field(field, low, high):
+    """
+    Convierte un campo cron (*, 5, 1-5, */15, 0-30/10, 1,15) en el conjunto de valores permitidos.
+    """
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Campo cron fuera de rango: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    Expresión cron de cinco campos: minuto, hora, día del mes, mes y día de la semana
+    (0 o 7 = domingo). Como en cron, si se restringen el día del mes y el día de la
+    semana basta con que coincida uno de los dos.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"La expresión cron debe tener 5 campos: {expression}")
+
+        self.expression = expression
+        self.minutes = parse_cron_field(fields[0], 0, 59)
+        self.hours = parse_cron_field(fields[1], 0, 23)
+        self.days = parse_cron_field(fields[2], 1, 31)
+        self.months = parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in parse_cron_field(fields[4], 0, 7)}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def day_matches(self, moment):
+        if moment.month not in self.months:
+            return False
+        day_matches = moment.day in self.days
+        weekday_matches = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_matches and weekday_matches
+        return day_matches or weekday_matches
+
+    def matches(self, moment):
+        return moment.minute in self.minutes and moment.hour in self.hours and self.day_matches(moment)
+
+    def next_after(self, moment):
+        """
+        Devuelve el primer minuto posterior a `moment` que cumple la expresión.
+        """
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        times = [(hour, minute) for hour in sorted(self.hours) for minute in sorted(self.minutes)]
+
+        # Cuatro años cubren cualquier combinación válida de día del mes y día de la semana
+        for _ in range(366 * 4):
+            if self.day_matches(day):
+                for hour, minute in times:
+                    candidate = day.replace(hour=hour, minute=minute)
+                    if candidate > moment:
+                        return candidate
+            day += timedelta(days=1)
+
+        raise ValueError(f"La expresión cron nunca se cumple: {self.expression}")
+
+
+def run_on_schedule(pipeline_factory, cron=PIPELINE_CRON):
+    """
+    Ejecuta el pipeline cada vez que se cumple la expresión cron.
+    Las ejecuciones no se superponen: la siguiente se calcula al terminar la actual.
+    """
+    schedule = CronSchedule(cron)
+    while True:
+        next_run = schedule.next_after(datetime.now())
+        print(f"Próxima ejecución del pipeline: {next_run:%Y-%m-%d %H:%M}")
+        while datetime.now() < next_run:
+            time.sleep(min(60.0, max(0.0, (next_run - datetime.now()).total_seconds())))
+
+        pipeline = pipeline_factory()
+        pipeline.report(pipeline.run())
@@ -1,16 +1,26 @@
+import logging
 import schedule
 import time
 from dotenv import load_dotenv
 import os
-from data.checker import calculate_updated_errors, fix_null_prices,update_real_prices
-from data.updater import etl_update
-from model.predicter import daily_prediction
-from utils.database import input_collection
-from utils.scraper import scrape_and_store
+from utils.database import get_input_collection
+from utils.crawl_scheduler import CRAWL_ADAPTIVE, due_documents, refresh_crawl_schedule
+from utils.scraper import create_session, scrape_and_store
+from utils.concurrent_scraper import scrape_concurrently
+from utils.sink import RecordSink
+from utils.day_index import DayIndex
+from utils.http_cache import HTTP_CACHE_ENABLED, ResponseCache
+from utils.leases import SCRAPING_DISTRIBUTED, LeaseQueue
+from utils.pipeline import PIPELINE_CRON, Pipeline, Stage, run_on_schedule
+from utils.metrics import configure_logging, sampled, start_metrics_server, track_job
 
 # Cargar variables de entorno
 load_dotenv()
 
+# "dag": el pipeline completo se inicia con PIPELINE_CRON y cada etapa espera a sus dependencias.
+# "clock": cada trabajo se ejecuta a su hora fija (EXECUTION_TIME_1..8).
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "dag")
+
 # Horarios desde variables de entorno
 EXECUTION_TIME_1 = os.getenv("EXECUTION_TIME_1", "03:00")
 EXECUTION_TIME_2 = os.getenv("EXECUTION_TIME_2", "03:40")
@@ -21,38 +31,217 @@ EXECUTION_TIME_6 = os.getenv("EXECUTION_TIME_6", "05:07")
 EXECUTION_TIME_7 = os.getenv("EXECUTION_TIME_7", "05:09")
 EXECUTION_TIME_8 = os.getenv("EXECUTION_TIME_8", "05:15")
 
-def process_documents():
-    print("Iniciando proceso de scraping...")
+# Configuración del motor de scraping
+SCRAPING_MODE = os.getenv("SCRAPING_MODE", "sequential")
+SCRAPING_CONCURRENCY = int(os.getenv("SCRAPING_CONCURRENCY", "8"))
+SCRAPING_RATE_PER_HOST = float(os.getenv("SCRAPING_RATE_PER_HOST", "2"))
+SCRAPING_BURST_PER_HOST = int(os.getenv("SCRAPING_BURST_PER_HOST", "2"))
+# Pasadas de scraping por ejecución del pipeline; cada una reintenta solo los productos faltantes
+SCRAPING_PASSES = int(os.getenv("SCRAPING_PASSES", "3"))
+
+logger = logging.getLogger(__name__)
+
+def process_documents(mode=None):
+    """
+    Realiza el scraping de todos los productos de la colección de entrada.
+    `mode` puede ser "sequential" o "concurrent"; por defecto se toma de SCRAPING_MODE.
+    Con CRAWL_ADAPTIVE solo se descargan los productos vencidos según el plan de
+    descargas, de mayor a menor prioridad. Con SCRAPING_DISTRIBUTED los productos se
+    reservan por lotes para que varios programadores los repartan sin repetirlos.
+    Devuelve las estadísticas de la ejecución; incluye "error" si falló.
+    """
+    mode = mode or SCRAPING_MODE
+    print(f"Iniciando proceso de scraping (modo {mode})...")
     try:
         # Obtener documentos desde la base de datos
-        documentos = input_collection.find()
+        leases = None
+        if SCRAPING_DISTRIBUTED:
+            leases = LeaseQueue()
+            documentos = leases.documents()
+        elif CRAWL_ADAPTIVE:
+            documentos = due_documents()
+        else:
+            documentos = get_input_collection().find()
 
-        for doc in documentos:
-            url = doc.get("url")
-            id_product = doc.get("idProduct")
+        # Productos ya capturados hoy: se omiten antes de descargar
+        day_index = DayIndex().load()
 
-            if url and id_product:
-                success = scrape_and_store(url, id_product)
-                if not success:
-                    print(f"El scraping falló para e producto {id_product}. Verifica la URL: {url}")
-            else:
-                print(f"Documento inválido: {doc}")
+        # Páginas guardadas en disco para revalidar con solicitudes condicionales
+        cache = ResponseCache() if HTTP_CACHE_ENABLED else None
+
+        # El sink guarda lo pendiente al salir, incluso si el scraping se interrumpe
+        try:
+            on_saved = leases.saved if leases is not None else None
+            with RecordSink(day_index=day_index, on_saved=on_saved) as sink:
+                if mode == "concurrent":
+                    stats = scrape_concurrently(
+                        documentos,
+                        sink,
+                        concurrency=SCRAPING_CONCURRENCY,
+                        rate_per_host=SCRAPING_RATE_PER_HOST,
+                        burst=SCRAPING_BURST_PER_HOST,
+                        cache=cache,
+                        leases=leases
+                    )
+                else:
+                    stats = process_documents_sequential(documentos, sink, cache=cache, leases=leases)
+            # Los registros entregados al sink que no se pudieron guardar cuentan como fallidos
+            # y la siguiente pasada los reintenta; la etapa solo falla si no se guardó ningún lote
+            stats["succeeded"] -= sink.failed
+            stats["failed"] += sink.failed
+            if sink.error and not sink.written:
+                stats["error"] = sink.error
+            elif sink.error:
+                stats["sink_error"] = sink.error
+                logger.warning("%s registros no se guardaron: %s", sink.failed, sink.error)
+        finally:
+            if cache is not None:
+                cache.save()
+                print(cache.summary())
+            # Después de guardar los registros: lo no procesado queda libre para otros trabajadores
+            if leases is not None:
+                leases.close()
+                print(leases.summary())
+
+        print(
+            f"Scraping finalizado: {stats['pages']} páginas en {stats['elapsed']:.1f} s "
+            f"({stats['pages_per_second']:.2f} páginas/s), {stats['succeeded']} exitosas, "
+            f"{stats['failed']} fallidas, {stats['skipped']} ya capturadas hoy, "
+            f"{stats['invalid']} documentos inválidos."
+        )
+        return stats
 
     except Exception as e:
         print("Error al procesar documentos:", str(e))
+        return {"error": str(e)}
+
+def process_documents_sequential(documentos, sink, cache=None, leases=None):
+    """
+    Recorre los documentos uno a uno con una única sesión keep-alive.
+    Los productos presentes en el índice del día del sink se omiten sin descargarlos.
+    Con `leases` se informa el resultado de cada documento a la cola de reservas; los
+    exitosos se completan cuando el sink guarda su lote.
+    """
+    session = create_session(pool_size=1)
+    stats = {"pages": 0, "succeeded": 0, "failed": 0, "invalid": 0, "skipped": 0}
+    started_at = time.monotonic()
+
+    for doc in documentos:
+        url = doc.get("url")
+        id_product = doc.get("idProduct")
+
+        if url and id_product:
+            if id_product in sink.day_index:
+                stats["skipped"] += 1
+                if leases is not None:
+                    leases.complete(doc, True)
+                continue
+
+            stats["pages"] += 1
+            if leases is not None:
+                leases.hold(doc)
+            success = scrape_and_store(url, id_product, session=session, sink=sink, cache=cache)
+            if leases is not None and not success:
+                leases.complete(doc, False)
+            if success:
+                stats["succeeded"] += 1
+            else:
+                stats["failed"] += 1
+                log, count = sampled("scrape_failed")
+                if log:
+                    logger.warning("El scraping falló para el producto %s. Verifica la URL: %s [%s fallas]", id_product, url, count)
+        else:
+            stats["invalid"] += 1
+            if leases is not None:
+                leases.complete(doc, True)
+            log, count = sampled("invalid_document")
+            if log:
+                logger.warning("Documento inválido: %s [%s documentos inválidos]", doc, count)
+
+    session.close()
+
+    stats["elapsed"] = time.monotonic() - started_at
+    stats["pages_per_second"] = stats["pages"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    return stats
+
+def scrape_passes(passes=None, mode=None):
+    """
+    Ejecuta varias pasadas de scraping; los productos ya capturados se omiten,
+    así que cada pasada solo reintenta los que fallaron. Termina antes si no hay fallas.
+    """
+    passes = SCRAPING_PASSES if passes is None else passes
+    stats = {}
+
+    # Si el plan no se puede actualizar se usa el de la ejecución anterior
+    if CRAWL_ADAPTIVE:
+        refresh_crawl_schedule()
+
+    for number in range(1, max(1, passes) + 1):
+        print(f"Pasada de scraping {number} de {passes}...")
+        stats = process_documents(mode)
+        if stats.get("error") or not stats.get("failed"):
+            break
+    return stats
+
+def build_pipeline():
+    """
+    Grafo de etapas del proceso diario. La predicción y la conciliación de precios
+    solo dependen del scraping, así que corren en paralelo.
+    Cada intento de una etapa se registra en las métricas de trabajos.
+    """
+    from data.checker import calculate_updated_errors, fix_null_prices, update_real_prices
+    from data.updater import etl_update
+    from model.predicter import daily_prediction
+
+    return Pipeline([
+        Stage("scrape", track_job("scrape", scrape_passes)),
+        Stage("predict", track_job("predict", daily_prediction), depends_on=["scrape"]),
+        Stage("reconcile", track_job("reconcile", update_real_prices), depends_on=["scrape"]),
+        Stage("fix", track_job("fix", fix_null_prices), depends_on=["reconcile"]),
+        Stage("errors", track_job("errors", calculate_updated_errors), depends_on=["fix", "predict"]),
+        Stage("etl", track_job("etl", etl_update), depends_on=["errors"]),
+    ])
+
+def run_pipeline():
+    """
+    Ejecuta el pipeline una vez; incluye "error" si alguna etapa falló o se omitió.
+    """
+    pipeline = build_pipeline()
+    records = pipeline.run()
+    stats = {"stages": records, "critical_path": pipeline.report(records)}
+    unfinished = [name for name, record in records.items() if record["status"] != "succeeded"]
+    if unfinished:
+        stats["error"] = f"Etapas sin completar: {', '.join(unfinished)}"
+    return stats
+
+def schedule_clock_jobs():
+    # pandas y scikit-learn solo se cargan al programar los trabajos que los usan
+    from data.checker import calculate_updated_errors, fix_null_prices, update_real_prices
+    from data.updater import etl_update
+    from model.predicter import daily_prediction
+
+    # Programar las ejecuciones
+    if CRAWL_ADAPTIVE:
+        schedule.every().day.at(EXECUTION_TIME_1).do(track_job("crawl_plan", refresh_crawl_schedule))
+    schedule.every().day.at(EXECUTION_TIME_1).do(track_job("scrape", process_documents))
+    schedule.every().day.at(EXECUTION_TIME_2).do(track_job("scrape", process_documents))
+    schedule.every().day.at(EXECUTION_TIME_3).do(track_job("scrape", process_documents))
+    schedule.every().day.at(EXECUTION_TIME_4).do(track_job("predict", daily_prediction))
+    schedule.every().day.at(EXECUTION_TIME_5).do(track_job("reconcile", update_real_prices))
+    schedule.every().day.at(EXECUTION_TIME_6).do(track_job("fix", fix_null_prices))
+    schedule.every().day.at(EXECUTION_TIME_7).do(track_job("errors", calculate_updated_errors))
+    schedule.every().day.at(EXECUTION_TIME_8).do(track_job("etl", etl_update))
+
+def start_scheduler(mode=None):
+    mode = mode or SCHEDULER_MODE
+    configure_logging()
+    start_metrics_server()
+    print(f"Iniciando programador (modo {mode})...")
+    if mode == "dag":
+        run_on_schedule(build_pipeline, PIPELINE_CRON)
+        return
 
-# Programar las ejecuciones
-schedule.every().day.at(EXECUTION_TIME_1).do(process_documents)
-schedule.every().day.at(EXECUTION_TIME_2).do(process_documents)
-schedule.every().day.at(EXECUTION_TIME_3).do(process_documents)
-schedule.every().day.at(EXECUTION_TIME_4).do(daily_prediction)
-schedule.every().day.at(EXECUTION_TIME_5).do(update_real_prices)
-schedule.every().day.at(EXECUTION_TIME_6).do(fix_null_prices)
-schedule.every().day.at(EXECUTION_TIME_7).do(calculate_updated_errors)
-schedule.every().day.at(EXECUTION_TIME_8).do(etl_update)
-
-def start_scheduler():
-    print("Iniciando programador...")
+    schedule_clock_jobs()
     while True:
         schedule.run_pending()
         time.sleep(1)
@@ -1,7 +1,15 @@
+import logging
+import os
+import random
+import time
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
-from utils.database import output_collection, connection, cursor
+from requests.adapters import HTTPAdapter
+from datetime import datetime
+from dotenv import load_dotenv
+from utils import metrics
+from utils.day_index import DayIndex
+from utils.extractors import get_extractor
+from utils.sink import RecordSink
 
 # Configuración de headers para scraping
 HEADERS = {
@@ -11,85 +19,179 @@ HEADERS = {
     "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"
 }
 
-def scrape_and_store(url, id_product):
+# Cargar variables de entorno
+load_dotenv()
+
+MAX_ATTEMPTS = 6
+# Segundos de espera para conectar y para recibir datos en cada solicitud
+SCRAPING_CONNECT_TIMEOUT = float(os.getenv("SCRAPING_CONNECT_TIMEOUT", "5"))
+SCRAPING_READ_TIMEOUT = float(os.getenv("SCRAPING_READ_TIMEOUT", "30"))
+# Espera exponencial entre reintentos: base * 2^(intento - 1), hasta el máximo, con variación aleatoria
+SCRAPING_BACKOFF_SECONDS = float(os.getenv("SCRAPING_BACKOFF_SECONDS", "1"))
+SCRAPING_BACKOFF_MAX_SECONDS = float(os.getenv("SCRAPING_BACKOFF_MAX_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+fetch_seconds = metrics.histogram("scrape_fetch_seconds", "Duración de cada descarga por código de estado")
+parse_seconds = metrics.histogram("scrape_parse_seconds", "Duración de la extracción de campos por extractor")
+pages_total = metrics.counter("scrape_pages_total", "Páginas procesadas por resultado")
+
+def create_session(pool_size=10):
     """
-    Realiza el scraping de una URL y guarda los datos obtenidos en MongoDB.
-    Implementa lógica de reintento hasta un máximo de intentos.
+    Crea una sesión HTTP con conexiones keep-alive reutilizables.
+    `pool_size` debe ser al menos la concurrencia máxima para no descartar conexiones.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Extractor configurado en SCRAPING_EXTRACTOR
+extractor = get_extractor()
+
+def parse_product(html):
+    """
+    Extrae título, calificación y precio de una página de producto.
+    """
+    with parse_seconds.time(extractor=extractor.name):
+        return extractor.extract(html)
+
+def parse_cached_response(url, resp, cache):
+    """
+    Extrae los campos de una respuesta usando la caché de páginas.
+    Con 304 se usa el cuerpo guardado; si el hash del cuerpo no cambió y ya se
+    extrajo con el extractor actual, los campos se devuelven sin analizar la página.
+    Con 200 se analiza `resp.text` y el cuerpo se guarda con la misma codificación.
+    """
+    if resp.status_code == 304:
+        entry = cache.not_modified(url)
+    elif resp.status_code == 200:
+        entry = cache.store(
+            url,
+            resp.content,
+            # Sin charset en la cabecera, requests decodifica con la codificación detectada
+            encoding=resp.encoding or resp.apparent_encoding,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified")
+        )
+    else:
+        return parse_product(resp.text)
+
+    fields = cache.cached_fields(entry, extractor.name)
+    if fields is None:
+        fields = parse_product(resp.text if resp.status_code == 200 else cache.read_text(entry))
+        cache.remember_fields(url, entry, fields, extractor.name)
+    else:
+        pages_total.inc(result="fields_cached")
+    return fields
+
+def is_retryable(status_code):
+    """
+    Respuestas que pueden cambiar en otro intento: límite de solicitudes y errores del servidor.
+    """
+    return status_code == 429 or status_code >= 500
+
+def scrape_product(url, id_product, session=None, rate_limiter=None, cache=None):
+    """
+    Descarga y extrae los datos de un producto sin guardarlos.
+    Reintenta con espera exponencial, hasta un máximo de intentos, solo los errores de
+    conexión y las respuestas 429 y 5xx; un error de extracción se propaga sin reintentar,
+    porque la misma página fallaría igual en cada intento.
+    Cada solicitud se corta tras SCRAPING_CONNECT_TIMEOUT / SCRAPING_READ_TIMEOUT segundos.
+    Con `cache` la solicitud es condicional (ETag/Last-Modified) y la página se guarda en disco.
+    Devuelve un diccionario con los campos extraídos o None si todos los intentos fallan.
     """
     attempts = 0
-    max_attempts = 6
+    timeout = (SCRAPING_CONNECT_TIMEOUT, SCRAPING_READ_TIMEOUT)
 
-    while attempts < max_attempts:
+    while attempts < MAX_ATTEMPTS:
         try:
-            resp = requests.get(url, headers=HEADERS)
-            soup = BeautifulSoup(resp.text, 'html.parser')
-
-            # Obtener el título
-            title = soup.find('span', {'id': 'productTitle'}).text.strip()
-
-            # Obtener la calificación de estrellas y truncar a los primeros 3 caracteres
-            rating = soup.find('span', {'id': 'acrPopover'})['title'][:3]
-
-            # Obtener el precio y eliminar el signo de $ y el prefijo 'US'
-            price = soup.find("span", {"class": "a-price"}).find("span").text.replace('US', '').replace('$', '').strip()
-
-            # Registrar la fecha y hora de la ejecución
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-            # Guardar resultados en MongoDB
-            product_data = {
-                "product_id": id_product,
-                "title": title,
-                "rating": rating,
-                "price": price,
-                "url": url,
-                "timestamp": timestamp
-            }
-
-            # Convertir el timestamp del día a un objeto datetime
-            start_of_day = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(hour=0, minute=0, second=0)
-            end_of_day = start_of_day + timedelta(days=1)
-
-            # Convertir los límites de tiempo a cadenas en el mismo formato
-            start_of_day_str = start_of_day.strftime('%Y-%m-%d %H:%M:%S')
-            end_of_day_str = end_of_day.strftime('%Y-%m-%d %H:%M:%S')
-
-            # Consulta para verificar el mismo día
-            product_found = output_collection.find_one({
-                "product_id": id_product,
-                "timestamp": {
-                    "$gte": start_of_day_str,
-                    "$lt": end_of_day_str
-                }
-            })
-
-            if product_found:
-                print(f"El producto con idProducto {id_product} y fecha {timestamp} ya estaba registrado en MongoDB.")
-                return True
-
-            result = output_collection.insert_one(product_data)
-            mongo_id = result.inserted_id 
-
-            # Guardar resultados en MySQL
-            mysql_query = """
-                INSERT INTO `scraping-data` (product_id, title, rating, price, url, timestamp, _id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-
-            mysql_data = (id_product, title, rating, price, url, timestamp, str(mongo_id))
-            cursor.execute(mysql_query, mysql_data)
-            connection.commit()
-
-            print(f"Ejecución exitosa. Datos guardados en MongoDB para idProducto {id_product}")
-            print("Título:", title)
-            print("Calificación:", rating)
-            print("Precio:", price)
-            print("Fecha y hora:", timestamp)
-            return True  # Indica que la ejecución fue exitosa
-
-        except Exception as e:
-            attempts += 1
-            print(f"Intento {attempts} para idProducto {id_product}: Ocurrió un error ({str(e)}). Reintentando...")
-    
-    print(f"No se pudo obtener la información para idProducto {id_product} después de {max_attempts} intentos.")
-    return False  # Indica que la ejecución falló
\ No newline at end of file
+            if rate_limiter is not None:
+                rate_limiter.acquire(url)
+
+            headers = cache.conditional_headers(url) if cache is not None else {}
+            started_at = time.perf_counter()
+            if session is not None:
+                resp = session.get(url, headers=headers, timeout=timeout)
+            else:
+                resp = requests.get(url, headers={**HEADERS, **headers}, timeout=timeout)
+            fetch_seconds.observe(time.perf_counter() - started_at, status=resp.status_code)
+            error = f"HTTP {resp.status_code}"
+        except requests.RequestException as e:
+            resp = None
+            error = e
+
+        if resp is not None and not is_retryable(resp.status_code):
+            try:
+                if cache is not None:
+                    return parse_cached_response(url, resp, cache)
+                return parse_product(resp.text)
+            except Exception:
+                pages_total.inc(result="failed")
+                raise
+
+        attempts += 1
+        pages_total.inc(result="retry")
+        logger.debug("Intento %s para idProducto %s: Ocurrió un error (%s). Reintentando...", attempts, id_product, error)
+        if attempts < MAX_ATTEMPTS:
+            delay = min(SCRAPING_BACKOFF_MAX_SECONDS, SCRAPING_BACKOFF_SECONDS * 2 ** (attempts - 1))
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    pages_total.inc(result="failed")
+    logger.debug("No se pudo obtener la información para idProducto %s después de %s intentos.", id_product, MAX_ATTEMPTS)
+    return None
+
+def store_product(url, id_product, fields, sink):
+    """
+    Entrega al sink los datos extraídos de un producto para guardarlos en MongoDB y MySQL,
+    salvo que el producto ya se haya registrado en el día.
+    Devuelve False si el producto ya estaba registrado.
+    """
+    if sink.day_index is not None and id_product in sink.day_index:
+        logger.debug("El producto con idProducto %s ya estaba registrado hoy.", id_product)
+        return False
+
+    # Registrar la fecha y hora de la ejecución
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    product_data = {
+        "product_id": id_product,
+        "title": fields["title"],
+        "rating": fields["rating"],
+        "price": fields["price"],
+        "url": url,
+        "timestamp": timestamp
+    }
+
+    sink.add(product_data)
+    return True
+
+def scrape_and_store(url, id_product, session=None, rate_limiter=None, sink=None, cache=None):
+    """
+    Realiza el scraping de una URL y guarda los datos obtenidos en MongoDB.
+    Implementa lógica de reintento hasta un máximo de intentos.
+    Sin `sink` los datos se guardan inmediatamente.
+    """
+    try:
+        fields = scrape_product(url, id_product, session=session, rate_limiter=rate_limiter, cache=cache)
+    except Exception as e:
+        logger.debug("No se pudieron extraer los datos del idProducto %s: %s", id_product, e)
+        return False
+    if fields is None:
+        return False  # Indica que la ejecución falló
+
+    try:
+        if sink is None:
+            with RecordSink(flush_size=1, day_index=DayIndex().load()) as single_sink:
+                store_product(url, id_product, fields, single_sink)
+            if single_sink.failed:
+                return False
+        else:
+            store_product(url, id_product, fields, sink)
+    except Exception as e:
+        logger.warning("Error guardando los datos del idProducto %s: %s", id_product, e)
+        return False
+
+    return True  # Indica que la ejecución fue exitosa
@@ -0,0 +1,179 @@
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError
+from utils import metrics
+from utils.database import get_output_collection, mysql_connection
+
+# Cargar variables de entorno
+load_dotenv()
+
+SINK_FLUSH_SIZE = int(os.getenv("SINK_FLUSH_SIZE", "200"))
+SINK_FLUSH_SECONDS = float(os.getenv("SINK_FLUSH_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+rows_written = metrics.counter("sink_rows_written_total", "Registros guardados por destino")
+rows_failed = metrics.counter("sink_rows_failed_total", "Registros no guardados por destino")
+flush_seconds = metrics.histogram("sink_flush_seconds", "Duración de cada lote guardado")
+
+MYSQL_INSERT_QUERY = """
+    INSERT INTO `scraping-data` (product_id, title, rating, price, url, timestamp, _id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def to_decimal(value):
+    """
+    Convierte el texto extraído a número para las columnas DECIMAL de MySQL
+    (sin separadores de miles); devuelve None si no es un número.
+    """
+    try:
+        return float(str(value).replace(',', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+class RecordSink:
+    """
+    Acumula los registros extraídos y los guarda por lotes en MongoDB y MySQL.
+    El lote se vacía al alcanzar `flush_size` registros o cuando el registro más
+    antiguo supera `flush_seconds` segundos; `close()` guarda lo pendiente.
+    Si recibe un `day_index`, lo mantiene al día con los registros aceptados y
+    quita los que no se pudieron guardar para que la siguiente pasada los reintente.
+    Cada lote toma una conexión de MySQL del pool solo mientras se escribe.
+    `failed` cuenta los registros no guardados y `error` guarda el último error que hizo perder registros.
+    Con `on_saved(registro, guardado)` se informa el resultado de cada registro al vaciar su lote.
+    """
+
+    def __init__(self, flush_size=SINK_FLUSH_SIZE, flush_seconds=SINK_FLUSH_SECONDS, day_index=None, collection=None,
+                 on_saved=None):
+        self.collection = collection if collection is not None else get_output_collection()
+        self.flush_size = max(1, int(flush_size))
+        self.flush_seconds = flush_seconds
+        self.day_index = day_index
+        self.on_saved = on_saved
+        self.buffer = []
+        self.oldest_at = None
+        self.retry_at = 0.0
+        self.written = 0
+        self.failed = 0
+        self.error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, record):
+        if not self.buffer:
+            self.oldest_at = time.monotonic()
+        self.buffer.append(record)
+
+        # Se marca al encolar para que un duplicado en el mismo lote no vuelva a entrar
+        if self.day_index is not None:
+            self.day_index.add(record["product_id"])
+
+        now = time.monotonic()
+        if now >= self.retry_at and (len(self.buffer) >= self.flush_size or now - self.oldest_at >= self.flush_seconds):
+            self.flush()
+
+    def flush(self, final=False):
+        """
+        Inserta el lote en MongoDB con `insert_many(ordered=False)` y replica en MySQL
+        en una única transacción solo los documentos que MongoDB aceptó.
+        Si MongoDB falla, el lote queda pendiente y se reintenta pasados `flush_seconds`
+        (con `final=True` se da por perdido). Si MySQL falla, los documentos se borran
+        de MongoDB para que ambas bases sigan coincidiendo.
+        Devuelve los registros guardados en ambas bases.
+        """
+        if not self.buffer:
+            return []
+
+        records = self.buffer
+        started_at = time.perf_counter()
+
+        # insert_many asigna el `_id` a cada documento antes de enviarlo
+        rejected = set()
+        try:
+            self.collection.insert_many(records, ordered=False)
+        except BulkWriteError as e:
+            # Un `_id` duplicado es un documento ya guardado en un intento anterior del lote
+            rejected = {
+                error["index"] for error in e.details.get("writeErrors", [])
+                if not (error.get("code") == 11000 and "_id" in (error.get("keyPattern") or {}))
+            }
+            if rejected:
+                rows_failed.inc(len(rejected), store="mongodb")
+                logger.warning("MongoDB rechazó %s de %s registros: %s", len(rejected), len(records), e)
+        except Exception as e:
+            message = f"Error guardando {len(records)} registros en MongoDB: {e}"
+            logger.error(message)
+            if not final:
+                self.retry_at = time.monotonic() + self.flush_seconds
+                return []
+            self.error = message
+            self.buffer = []
+            self.forget(records)
+            rows_failed.inc(len(records), store="mongodb")
+            return []
+
+        self.buffer = []
+        self.oldest_at = None
+        self.retry_at = 0.0
+
+        accepted = [record for index, record in enumerate(records) if index not in rejected]
+        self.forget([records[index] for index in rejected])
+
+        mysql_data = [
+            (r["product_id"], r["title"], to_decimal(r["rating"]), to_decimal(r["price"]), r["url"], r["timestamp"], str(r["_id"]))
+            for r in accepted
+        ]
+
+        try:
+            if mysql_data:
+                with mysql_connection() as connection:
+                    connection.cursor().executemany(MYSQL_INSERT_QUERY, mysql_data)
+                    connection.commit()
+        except Exception as e:
+            self.error = f"Error guardando {len(mysql_data)} registros en MySQL: {e}"
+            logger.error(self.error)
+            rows_failed.inc(len(mysql_data), store="mysql")
+            self.remove_from_mongo(accepted)
+            self.forget(accepted)
+            return []
+
+        self.written += len(accepted)
+        rows_written.inc(len(accepted), store="mongodb")
+        rows_written.inc(len(mysql_data), store="mysql")
+        flush_seconds.observe(time.perf_counter() - started_at)
+        logger.info("Lote guardado: %s registros en MongoDB y MySQL.", len(accepted))
+        if self.on_saved is not None:
+            for record in accepted:
+                self.on_saved(record, True)
+        return accepted
+
+    def remove_from_mongo(self, records):
+        """
+        Borra de MongoDB los documentos cuyo registro no llegó a MySQL.
+        """
+        try:
+            self.collection.delete_many({"_id": {"$in": [record["_id"] for record in records]}})
+        except Exception as e:
+            logger.error("No se pudieron borrar de MongoDB %s registros sin copia en MySQL: %s", len(records), e)
+
+    def forget(self, records):
+        """
+        Cuenta los registros como no guardados y los quita del índice del día para reintentarlos.
+        """
+        self.failed += len(records)
+        for record in records:
+            if self.day_index is not None:
+                self.day_index.discard(record["product_id"])
+            if self.on_saved is not None:
+                self.on_saved(record, False)
+
+    def close(self):
+        self.flush(final=True)